@@ -4,4 +4,7 @@ set -o errexit
 pip install -r requirements.txt
 python manage.py collectstatic --noinput
 python manage.py migrate
-python manage.py create_sample_reports
\ No newline at end of file
+python manage.py create_sample_reports
+python manage.py rebuild_report_clusters
+python manage.py reconcile_report_counts
+python manage.py rebuild_resolution_stats
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+Gunicorn settings for production: uvicorn workers serving the ASGI
+application, so HTTP, WebSockets (/ws/...) and event streams (/api/events/...)
+share one port.
+
+    gunicorn tubig_tracker.asgi:application -c gunicorn.conf.py
+
+Every setting can be overridden on the command line or with GUNICORN_CMD_ARGS.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = 'tubig_tracker.workers.UvicornWorker'
+
+# An async worker holds thousands of idle sockets on one event loop, so one
+# per core is enough; sync views and ORM calls run in each worker's thread
+# pool (ASGI_THREADS). Live updates only cross workers through Redis, so
+# without REDIS_URL run a single worker.
+if os.environ.get('REDIS_URL'):
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+else:
+    workers = 1
+
+# Heartbeat timeout: only a worker whose event loop is blocked misses it.
+timeout = 60
+# Time allowed to finish in-flight requests on restart or deploy before the
+# worker is killed; tubig_tracker.workers cancels open streams ahead of it.
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+forwarded_allow_ips = '*'
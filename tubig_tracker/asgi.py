@@ -8,23 +8,29 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-import tubig_tracker_app.routing
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tubig_tracker.settings')
 
-application = get_asgi_application()
+# Set up Django before importing the routing: the consumers import models.
+django_asgi_app = get_asgi_application()
 
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+import tubig_tracker_app.routing  # noqa: E402
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
-        URLRouter(
-            tubig_tracker_app.routing.websocket_urlpatterns
+    "http": django_asgi_app,
+    # Sockets authenticate with the session cookie, so refuse cross-site
+    # origins the way CSRF protection does for forms.
+    "websocket": AllowedHostsOriginValidator(
+        AuthMiddlewareStack(
+            URLRouter(
+                tubig_tracker_app.routing.websocket_urlpatterns
+            )
         )
     ),
 })
-        
\ No newline at end of file
@@ -72,6 +72,39 @@ AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',},
 ]
 
+# Cache: shared through Redis when REDIS_URL is set, per-process otherwise.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Serialized map feed snapshot lifetime (seconds); Report writes invalidate it sooner.
+REPORT_FEED_CACHE_TIMEOUT = 60 * 60
+
+# Rendered /tiles/reports/{z}/{x}/{y}.mvt files, one file per tile and version of its cells.
+REPORT_TILE_CACHE_DIR = os.environ.get('REPORT_TILE_CACHE_DIR', os.path.join(BASE_DIR, 'tile_cache'))
+
+# Seconds a live report socket holds messages so bursts go out as one frame,
+# with repeated updates to the same report merged; 0 sends each immediately.
+REPORT_STREAM_COALESCE_WINDOW = float(os.environ.get('REPORT_STREAM_COALESCE_WINDOW', '0.25'))
+
+# Messages a live report socket may have queued before it counts as a slow
+# consumer. REPORT_STREAM_OVERFLOW then decides: 'snapshot' replaces the queue
+# with one fresh snapshot, 'disconnect' closes the socket so the client
+# reconnects from its last seq.
+REPORT_STREAM_QUEUE_LIMIT = int(os.environ.get('REPORT_STREAM_QUEUE_LIMIT', '1000'))
+REPORT_STREAM_OVERFLOW = os.environ.get('REPORT_STREAM_OVERFLOW', 'snapshot')
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -109,11 +142,28 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 INSTALLED_APPS += ['channels']
 ASGI_APPLICATION = 'tubig_tracker.asgi.application'
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+
+# Channel layer: through Redis when REDIS_URL is set, so a broadcast raised in
+# any worker reaches sockets held by every other worker and node. Pub/sub
+# delivers a group message with one PUBLISH per subscribed process; set
+# CHANNEL_LAYER_BACKEND=channels_redis.core.RedisChannelLayer for the
+# list-based layer instead. Without Redis, events only reach sockets in the
+# same process, which is fine for a single-process dev server.
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': os.environ.get('CHANNEL_LAYER_BACKEND', 'channels_redis.pubsub.RedisPubSubChannelLayer'),
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
 
 
 # Ensure custom user model is used. The project's custom User model is
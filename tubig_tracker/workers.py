@@ -0,0 +1,28 @@
+"""
+Gunicorn worker for serving the ASGI application (see gunicorn.conf.py).
+"""
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+# Seconds between uvicorn cancelling the connections still open at shutdown
+# and gunicorn's graceful_timeout killing the worker.
+SHUTDOWN_MARGIN = 10
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """
+    uvicorn under gunicorn, with Django's lack of ASGI lifespan support
+    acknowledged and a bounded graceful shutdown.
+
+    On shutdown uvicorn closes WebSockets with 1012 straight away, but waits
+    for HTTP responses to finish, which an event stream never does. Bounding
+    that wait below gunicorn's graceful_timeout lets uvicorn cancel the
+    remaining streams (running their cleanup) instead of the whole worker
+    being killed. Clients of either kind reconnect and resume from their last
+    seq.
+    """
+
+    CONFIG_KWARGS = {**BaseUvicornWorker.CONFIG_KWARGS, 'lifespan': 'off'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.config.timeout_graceful_shutdown = max(self.cfg.graceful_timeout - SHUTDOWN_MARGIN, 1)
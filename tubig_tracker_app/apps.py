@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TubigTrackerAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tubig_tracker_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,144 @@
+"""
+Precomputed map clusters: one ReportClusterCell per geohash cell and precision,
+adjusted in place whenever a report is created, moved, deleted or changes status.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import report_feed
+from .models import Report, ReportClusterCell
+
+CLUSTER_PRECISIONS = range(1, 9)
+MAX_CLUSTER_CELLS = getattr(settings, 'REPORT_CLUSTER_MAX_CELLS', 64)
+
+# Report status -> ReportClusterCell counter column.
+STATUS_COLUMNS = {
+    'Pending': 'pending',
+    'In Progress': 'in_progress',
+    'Resolved': 'resolved',
+}
+
+# Geohash precision whose cells are roughly a quarter of a 256px tile wide,
+# indexed by Leaflet zoom level.
+_ZOOM_PRECISIONS = [1, 1, 1, 2, 2, 3, 3, 3, 4, 4, 5, 5, 5, 6, 6, 7, 7, 7, 8]
+
+
+def precision_for_zoom(zoom):
+    return _ZOOM_PRECISIONS[max(0, min(zoom, len(_ZOOM_PRECISIONS) - 1))]
+
+
+def _contribution(state):
+    """(geocell, lat, lng, status) a saved report adds to the clusters, or None."""
+    if not state or not state['geocell']:
+        return None
+    return state['geocell'], float(state['latitude']), float(state['longitude']), state['status']
+
+
+def _apply(contribution, sign):
+    geocell, lat, lng, status = contribution
+    changes = {
+        'count': F('count') + sign,
+        'latitude_sum': F('latitude_sum') + sign * lat,
+        'longitude_sum': F('longitude_sum') + sign * lng,
+    }
+    column = STATUS_COLUMNS.get(status)
+    if column:
+        changes[column] = F(column) + sign
+
+    for precision in CLUSTER_PRECISIONS:
+        cell = geocell[:precision]
+        cells = ReportClusterCell.objects.filter(precision=precision, cell=cell)
+        if cells.update(**changes) or sign < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ReportClusterCell.objects.create(
+                    precision=precision, cell=cell, count=1, latitude_sum=lat, longitude_sum=lng,
+                    **({column: 1} if column else {}),
+                )
+        except IntegrityError:
+            # Another writer created the cell first; add to theirs.
+            cells.update(**changes)
+
+    if sign < 0:
+        ReportClusterCell.objects.filter(
+            precision__in=CLUSTER_PRECISIONS, cell__in=[geocell[:p] for p in CLUSTER_PRECISIONS], count__lte=0,
+        ).delete()
+
+
+def report_saved(report):
+    """Move the report's contribution from its previous state to its current one."""
+    old = _contribution(report.saved_state)
+    new = _contribution(report.tracked_state())
+    if old == new:
+        return
+    with transaction.atomic():
+        if old:
+            _apply(old, -1)
+        if new:
+            _apply(new, +1)
+
+
+def report_deleted(report):
+    old = _contribution(report.saved_state or report.tracked_state())
+    if old:
+        with transaction.atomic():
+            _apply(old, -1)
+
+
+def clusters(bbox, zoom):
+    """Clusters whose centroid falls inside ``bbox`` at the precision for ``zoom``."""
+    precision = precision_for_zoom(zoom)
+    cells = report_feed.cell_range_q('cell', bbox, MAX_CLUSTER_CELLS, max_precision=precision)
+
+    min_lng, min_lat, max_lng, max_lat = bbox
+    results = []
+    for row in ReportClusterCell.objects.filter(cells, precision=precision, count__gt=0):
+        lat = row.latitude_sum / row.count
+        lng = row.longitude_sum / row.count
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            continue
+        results.append({
+            'cell': row.cell,
+            'latitude': lat,
+            'longitude': lng,
+            'count': row.count,
+            'status': {
+                'Pending': row.pending,
+                'In Progress': row.in_progress,
+                'Resolved': row.resolved,
+            },
+        })
+    return {'precision': precision, 'clusters': results}
+
+
+def rebuild():
+    """Recompute every cluster cell from the reports table."""
+    totals = {}
+    rows = (
+        Report.objects.filter(geocell__isnull=False)
+        .values_list('geocell', 'latitude', 'longitude', 'status')
+        .iterator(chunk_size=2000)
+    )
+    for geocell, lat, lng, status in rows:
+        column = STATUS_COLUMNS.get(status)
+        for precision in CLUSTER_PRECISIONS:
+            cell = totals.setdefault((precision, geocell[:precision]), {
+                'count': 0, 'latitude_sum': 0.0, 'longitude_sum': 0.0,
+                'pending': 0, 'in_progress': 0, 'resolved': 0,
+            })
+            cell['count'] += 1
+            cell['latitude_sum'] += lat
+            cell['longitude_sum'] += lng
+            if column:
+                cell[column] += 1
+
+    with transaction.atomic():
+        ReportClusterCell.objects.all().delete()
+        ReportClusterCell.objects.bulk_create(
+            [ReportClusterCell(precision=precision, cell=cell, **values)
+             for (precision, cell), values in totals.items()],
+            batch_size=1000,
+        )
+    return len(totals)
@@ -1,19 +1,402 @@
+import asyncio
 import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from . import events, geo, live_metrics, report_pages
+from .models import Complaint, Report
+
+MUNICIPALITIES = {name for name, _ in Complaint.AREA_CHOICES}
+STATUSES = {status for status, _ in Report.STATUS_CHOICES}
+COALESCE_WINDOW = getattr(settings, 'REPORT_STREAM_COALESCE_WINDOW', 0.25)
+QUEUE_LIMIT = getattr(settings, 'REPORT_STREAM_QUEUE_LIMIT', 1000)
+OVERFLOW_POLICY = getattr(settings, 'REPORT_STREAM_OVERFLOW', 'snapshot')
+# Close code for a connection evicted by the 'disconnect' overflow policy.
+OVERFLOW_CLOSE_CODE = 4008
+
+
+def _coalesce_key(message):
+    if message['type'] == 'report_updated':
+        return ('report', message['report']['id'])
+    if message['type'] == 'report_deleted':
+        return ('report', message['id'])
+    return ('seq', message.get('seq'))
+
+
+def _merge(earlier, later):
+    """One message standing for ``earlier`` followed by ``later`` about the same report."""
+    if earlier['type'] == 'report_updated' and later['type'] == 'report_updated':
+        merged = dict(later)
+        if earlier['event'] == 'created':
+            merged['event'] = 'created'
+        if 'previous_status' in earlier:
+            merged['previous_status'] = earlier['previous_status']
+        return merged
+    return later
+
+
+class ResumableConsumer(AsyncWebsocketConsumer):
+    """
+    Base for the report streams: every message carries a ``seq``, and a client
+    reconnecting with ``?last_seq=N`` is first sent what it missed since N (or a
+    snapshot when that is no longer available) before live messages resume.
+
+    Channel layer handlers only queue messages; one writer task per connection
+    sends them. It waits COALESCE_WINDOW seconds before each send, so updates
+    to the same report are merged, and more than one message goes out as a
+    single ``{"type": "batch", "seq": ..., "messages": [...]}`` frame.
+
+    Messages reach the connection in no particular seq order (see
+    events.REORDER_WINDOW), so one is skipped only if its seq was already
+    sent or is covered by a snapshot or first load (at or below ``floor``).
+    ``last_seq`` is the highest seq seen.
+
+    A client that cannot keep up lets the queue grow while the writer waits on
+    the socket. Past QUEUE_LIMIT messages the queue is dropped and
+    OVERFLOW_POLICY applies: 'snapshot' sends one fresh snapshot in their
+    place, 'disconnect' sends ``{"type": "overflow", "seq": N}`` and closes
+    with OVERFLOW_CLOSE_CODE, N being the seq to reconnect with.
+    """
+
+    pending = None
+    seen = None
+    floor = None
+    writer = None
+    overflowed = False
+    streaming = False
+    depth = 0
+
+    def allowed(self, user):
+        return user.is_authenticated
+
+    def log_group(self, user):
+        """The group whose event log is replayed on reconnect."""
+        raise NotImplementedError
+
+    def stream_groups(self):
+        """The channel layer groups to listen on."""
+        return [self.group_name]
+
+    def snapshot(self, user):
+        raise NotImplementedError
+
+    def deliver(self, message):
+        """The message to send for ``message``, or None to skip it."""
+        return message
+
+    def query(self):
+        return parse_qs(self.scope.get('query_string', b'').decode())
+
+    def setup(self):
+        """Read per-connection options from the query string; ValueError rejects the connection."""
 
-class DashboardConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        await self.channel_layer.group_add("dashboard_updates", self.channel_name)
+        user = self.scope.get('user')
+        if not (user and self.allowed(user)):
+            await self.close()
+            return
+        try:
+            self.setup()
+        except ValueError:
+            await self.close(code=4400)
+            return
+        self.user = user
+        self.pending = {}
+        self.seen = set()
+        self.group_name = self.log_group(user)
+        self.joined = self.stream_groups()
+        # Join before reading the log so nothing falls between the two; live
+        # messages the catch-up already covered are dropped by seq.
+        for group in self.joined:
+            await self.channel_layer.group_add(group, self.channel_name)
         await self.accept()
+        live_metrics.adjust('stream.connections', 1)
+
+        self.last_seq = self.sent_seq = self.requested_seq()
+        messages = await database_sync_to_async(events.resume)(
+            self.group_name, self.last_seq, lambda: self.snapshot(user),
+        )
+        for message in messages:
+            if message['type'] in ('hello', 'snapshot'):
+                # Sent after the replayed messages, which are queued before it.
+                await self.write_pending()
+                if message['type'] == 'snapshot' or self.last_seq is None:
+                    # The client's state is read after this: it covers every earlier seq.
+                    self.cover(message['seq'])
+                else:
+                    self.last_seq = max(self.last_seq, message['seq'])
+                await self.write(message)
+            else:
+                await self.send_message(message)
+        self.streaming = True
+        self.start_writer()
+
+    def requested_seq(self):
+        try:
+            return int(self.query()['last_seq'][0])
+        except (KeyError, ValueError):
+            return None
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("dashboard_updates", self.channel_name)
+        if self.writer:
+            self.writer.cancel()
+        if self.pending is not None:
+            self.pending = {}
+            self.track_depth()
+            live_metrics.adjust('stream.connections', -1)
+        for group in getattr(self, 'joined', ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
 
     async def receive(self, text_data):
         pass
 
+    def first_sighting(self, seq):
+        """Record ``seq`` as sent; False if it already was or is covered."""
+        if (self.floor is not None and seq <= self.floor) or seq in self.seen:
+            return False
+        self.seen.add(seq)
+        if self.last_seq is None or seq > self.last_seq:
+            self.last_seq = seq
+            if len(self.seen) > 2 * events.REORDER_WINDOW:
+                self.seen = {old for old in self.seen if old > seq - events.REORDER_WINDOW}
+        return True
+
+    def cover(self, seq):
+        """Mark every seq up to ``seq`` as sent, as a snapshot read after it does."""
+        self.floor = seq if self.floor is None else max(self.floor, seq)
+        self.seen = {old for old in self.seen if old > self.floor}
+        self.last_seq = seq if self.last_seq is None else max(self.last_seq, seq)
+
+    async def send_message(self, message):
+        """Queue ``message`` for the writer unless it was already sent or is filtered out."""
+        seq = message.get('seq')
+        if seq is not None and not self.first_sighting(seq):
+            return
+        message = self.deliver(message)
+        if message is None:
+            return
+
+        key = _coalesce_key(message)
+        if key in self.pending:
+            live_metrics.incr('stream.merged')
+            message = _merge(self.pending[key], message)
+        self.pending[key] = message
+        live_metrics.incr('stream.messages')
+        if len(self.pending) > QUEUE_LIMIT:
+            live_metrics.incr('stream.overflows')
+            self.pending = {}
+            self.overflowed = True
+        self.track_depth()
+        self.start_writer()
+
+    def track_depth(self):
+        depth = len(self.pending)
+        live_metrics.adjust('stream.queue_depth', depth - self.depth)
+        live_metrics.record_max('stream.queue_depth_max', depth)
+        self.depth = depth
+
+    def start_writer(self):
+        if self.streaming and self.writer is None and (self.pending or self.overflowed):
+            self.writer = asyncio.ensure_future(self.run_writer())
+
+    async def run_writer(self):
+        try:
+            while self.pending or self.overflowed:
+                if COALESCE_WINDOW > 0:
+                    await asyncio.sleep(COALESCE_WINDOW)
+                if self.overflowed:
+                    if not await self.recover():
+                        return
+                else:
+                    await self.write_pending()
+        finally:
+            self.writer = None
+
+    async def recover(self):
+        """Apply OVERFLOW_POLICY; False once the connection is being closed."""
+        self.overflowed = False
+        self.pending = {}
+        self.track_depth()
+        if OVERFLOW_POLICY == 'disconnect':
+            live_metrics.incr('stream.evictions')
+            await self.send_frame({'type': 'overflow', 'seq': self.sent_seq})
+            await self.close(code=OVERFLOW_CLOSE_CODE)
+            return False
+        # Everything up to last_seq was dropped; the snapshot, read after it,
+        # already contains those changes.
+        seq = self.last_seq
+        self.cover(seq)
+        data = await database_sync_to_async(self.snapshot)(self.user)
+        live_metrics.incr('stream.overflow_snapshots')
+        await self.write({'type': 'snapshot', 'seq': seq, **data})
+        return True
+
+    async def write_pending(self):
+        if not self.pending:
+            return
+        messages = list(self.pending.values())
+        self.pending = {}
+        self.track_depth()
+        if len(messages) == 1:
+            await self.send_frame(messages[0])
+            return
+        live_metrics.incr('stream.batches')
+        await self.send_frame({
+            'type': 'batch',
+            'seq': max(message.get('seq') or 0 for message in messages),
+            'messages': messages,
+        })
+
+    async def write(self, message):
+        live_metrics.incr('stream.messages')
+        await self.send_frame(message)
+
+    async def send_frame(self, frame):
+        live_metrics.incr('stream.frames')
+        if frame.get('seq') is not None:
+            self.sent_seq = frame['seq'] if self.sent_seq is None else max(self.sent_seq, frame['seq'])
+        await self.send(text_data=json.dumps(frame))
+
     async def report_updated(self, event):
+        await self.send_message(event)
+
+    async def report_deleted(self, event):
+        await self.send_message(event)
+
+
+class DashboardConsumer(ResumableConsumer):
+    """
+    Report create, update and delete events for the admin dashboard.
+
+    By default every report is streamed. A connection can narrow that to some
+    ``municipalities``, ``statuses`` and/or a ``bbox`` (minLng, minLat, maxLng,
+    maxLat), either with ``?municipality=Naval,Caibiran&status=Pending&bbox=...``
+    on connect or at any time by sending::
+
+        {"type": "subscribe", "municipalities": ["Naval"], "statuses": [], "bbox": null}
+
+    which is answered with ``{"type": "subscribed", ...}``; an empty
+    subscription streams everything again. Filters combine with AND, values
+    within one filter with OR. Clients should reload the feed after changing
+    their subscription, since reports they had not been sent are not replayed.
+
+    Only one filter decides which routing groups the connection joins (the
+    bbox's covering cells, else the municipalities, else the statuses); the
+    rest are checked on the few events that arrive through those groups. An
+    update moving a report out of the subscription arrives as report_deleted.
+    """
+
+    filters = {'municipalities': set(), 'statuses': set(), 'bbox': None}
+
+    def allowed(self, user):
+        return user.is_authenticated and report_pages.can_view_all(user)
+
+    def log_group(self, user):
+        return events.DASHBOARD_GROUP
+
+    def stream_groups(self):
+        if self.filters['bbox']:
+            cells = geo.cover(self.filters['bbox'], max_precision=events.CELL_GROUP_PRECISION)
+            return [events.cell_group(cell) for cell in cells]
+        if self.filters['municipalities']:
+            return [events.municipality_group(name) for name in sorted(self.filters['municipalities'])]
+        if self.filters['statuses']:
+            return [events.status_group(status) for status in sorted(self.filters['statuses'])]
+        return [events.DASHBOARD_GROUP]
+
+    def snapshot(self, user):
+        return events.dashboard_snapshot()
+
+    def setup(self):
+        query = self.query()
+        self.filters = parse_filters(
+            _split(query.get('municipality')), _split(query.get('status')), query.get('bbox', [None])[0],
+        )
+
+    def matches(self, state):
+        filters = self.filters
+        if filters['municipalities'] and state['municipality'] not in filters['municipalities']:
+            return False
+        if filters['statuses'] and state['status'] not in filters['statuses']:
+            return False
+        if filters['bbox']:
+            if state['latitude'] is None or state['longitude'] is None:
+                return False
+            min_lng, min_lat, max_lng, max_lat = filters['bbox']
+            return min_lat <= state['latitude'] <= max_lat and min_lng <= state['longitude'] <= max_lng
+        return True
+
+    def deliver(self, message):
+        message = dict(message)
+        current = message.pop('match', None)
+        previous = message.pop('previous', None)
+        if current is None or self.matches(current):
+            return message
+        if message['type'] == 'report_updated' and previous and self.matches(previous):
+            return {'type': 'report_deleted', 'id': message['report']['id'], 'seq': message['seq']}
+        return None
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            return
+        if not isinstance(data, dict) or data.get('type') != 'subscribe':
+            return
+        bbox = data.get('bbox')
+        if isinstance(bbox, list):
+            bbox = ','.join(str(value) for value in bbox)
+        try:
+            filters = parse_filters(data.get('municipalities') or [], data.get('statuses') or [], bbox)
+        except (TypeError, ValueError) as error:
+            await self.send(text_data=json.dumps({'type': 'error', 'error': str(error)}))
+            return
+
+        for group in self.joined:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.filters = filters
+        self.joined = self.stream_groups()
+        for group in self.joined:
+            await self.channel_layer.group_add(group, self.channel_name)
         await self.send(text_data=json.dumps({
-            'type': 'report_updated',
-            'report': event['report']
-        }))
\ No newline at end of file
+            'type': 'subscribed',
+            'municipalities': sorted(filters['municipalities']),
+            'statuses': sorted(filters['statuses']),
+            'bbox': filters['bbox'],
+            'seq': self.sent_seq,
+        }))
+
+
+def _split(values):
+    return [value.strip() for value in (values or [''])[0].split(',') if value.strip()]
+
+
+def parse_filters(municipalities, statuses, bbox):
+    """Dashboard subscription filters; raises ValueError for unknown values or a malformed bbox."""
+    municipalities = set(municipalities)
+    statuses = set(statuses)
+    if municipalities - MUNICIPALITIES:
+        raise ValueError(f"Unknown municipality: {', '.join(sorted(municipalities - MUNICIPALITIES))}")
+    if statuses - STATUSES:
+        raise ValueError(f"Unknown status: {', '.join(sorted(statuses - STATUSES))}")
+    return {
+        'municipalities': municipalities,
+        'statuses': statuses,
+        'bbox': geo.parse_bbox(bbox) if bbox else None,
+    }
+
+
+class UserConsumer(ResumableConsumer):
+    """A signed-in resident's own report changes and new notifications."""
+
+    def log_group(self, user):
+        return events.user_group(user.pk)
+
+    def snapshot(self, user):
+        return events.user_snapshot(user)
+
+    async def notification_created(self, event):
+        await self.send_message(event)
@@ -0,0 +1,68 @@
+"""
+Cached rollup of the admin dashboard's counts and monthly charts.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import report_counts, report_feed, report_stats, status_history
+from .models import Report, User
+
+
+ROLLUP_CACHE_KEY = 'dashboard_stats:rollup'
+# Report and User writes delete the rollup; the timeout bounds how stale it can
+# get from writes made elsewhere (other processes without a shared cache,
+# bulk updates that send no signals).
+ROLLUP_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_STATS_CACHE_TIMEOUT', 60)
+
+def _monthly_counts(field, year):
+    """Count() per month of ``year`` on the ``field`` date, as month_1..month_12."""
+    return {
+        f'month_{month}': Count('id', filter=Q(**{f'{field}__year': year, f'{field}__month': month}))
+        for month in range(1, 13)
+    }
+
+
+def _hours(row):
+    """A status_history.resolution_times() row with its percentiles in hours."""
+    return {key: value / 3600 if '_p' in key and value is not None else value for key, value in row.items()}
+
+
+def _build_rollup(year):
+    counts = report_counts.counts(report_feed.ALL_REPORTS_SCOPE)
+    # The daily stats table grows with days and places, not with the number of reports.
+    months = report_stats.series(date(year, 1, 1), date(year, 12, 31), 'month')['series']['total']
+    users = User.objects.aggregate(total=Count('id'), **_monthly_counts('date_joined', year))
+    latest_user = User.objects.order_by('-date_joined').values_list('username', flat=True).first()
+    latest_report = Report.objects.order_by('-created_at').values_list('title', flat=True).first()
+    return {
+        'year': year,
+        'total_reports': sum(counts.values()),
+        'pending_reports': counts.get('Pending', 0),
+        'in_progress_reports': counts.get('In Progress', 0),
+        'resolved_reports': counts.get('Resolved', 0),
+        'reports_per_month': months,
+        'total_users': users['total'],
+        'users_per_month': [users[f'month_{month}'] for month in range(1, 13)],
+        'latest_user': latest_user,
+        'latest_report': latest_report,
+        # Precomputed by rebuild_resolution_stats, so this reads a few rows.
+        'resolution_times': [_hours(row) for row in status_history.resolution_times()],
+    }
+
+
+def rollup():
+    """Dashboard counts for the current year, rebuilt at most once per timeout."""
+    year = timezone.localdate().year
+    entry = cache.get(ROLLUP_CACHE_KEY)
+    if entry is None or entry['year'] != year:
+        entry = _build_rollup(year)
+        cache.set(ROLLUP_CACHE_KEY, entry, ROLLUP_CACHE_TIMEOUT)
+    return entry
+
+
+def invalidate():
+    cache.delete(ROLLUP_CACHE_KEY)
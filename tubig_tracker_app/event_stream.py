@@ -0,0 +1,108 @@
+"""
+Server-Sent Events transport for the live report streams, for clients behind
+proxies that break WebSockets (/api/events/dashboard/, /api/events/user/).
+
+Each stream runs the same consumer class as the matching /ws/ route, driven
+here instead of by a WebSocket server, so filters, coalescing, resume and the
+slow-consumer policy all behave the same. Every frame becomes one SSE event
+whose ``id`` is the frame's seq: the browser's automatic reconnect sends it
+back as Last-Event-ID, which resumes exactly like ``?last_seq=``.
+
+Needs an ASGI server; an idle stream is a suspended coroutine rather than a
+busy worker.
+"""
+import asyncio
+import contextvars
+import json
+from urllib.parse import parse_qsl, urlencode
+
+from django.http import JsonResponse, StreamingHttpResponse
+
+# Comment lines sent while idle so proxies keep the connection open.
+HEARTBEAT_SECONDS = 15
+# Delay the browser waits before reconnecting, in milliseconds.
+RETRY_MS = 3000
+# Frames held between the consumer and the response. A client reading slower
+# than this blocks the consumer's writer, whose own queue limit then applies.
+FRAME_BUFFER = 16
+
+
+def _scope(request, user):
+    query = [(key, value) for key, value in parse_qsl(request.META.get('QUERY_STRING', '')) if key != 'last_seq']
+    last_seq = request.headers.get('Last-Event-ID') or request.GET.get('last_seq')
+    if last_seq:
+        query.append(('last_seq', last_seq))
+    return {
+        'type': 'websocket',
+        'path': request.path,
+        'query_string': urlencode(query).encode(),
+        'headers': [],
+        'user': user,
+    }
+
+
+def _event(text):
+    seq = json.loads(text).get('seq')
+    head = f'id: {seq}\n' if seq is not None else ''
+    return f'{head}data: {text}\n\n'
+
+
+async def response(consumer_class, request):
+    """A text/event-stream response carrying ``consumer_class``'s frames for this request."""
+    user = await request.auser()
+    incoming = asyncio.Queue()
+    frames = asyncio.Queue(FRAME_BUFFER)
+    opened = asyncio.get_running_loop().create_future()
+
+    async def send(message):
+        if message['type'] == 'websocket.accept':
+            opened.set_result(None)
+        elif message['type'] == 'websocket.close':
+            if not opened.done():
+                opened.set_result(message.get('code', 1000))
+            else:
+                await frames.put(None)
+        elif message['type'] == 'websocket.send':
+            await frames.put(message['text'])
+
+    await incoming.put({'type': 'websocket.connect'})
+    # The consumer outlives this view call, so it runs in a fresh context: in
+    # the request's, its sync_to_async calls would be queued on the request
+    # thread's executor, which stops serving them once the view returns.
+    consumer = asyncio.get_running_loop().create_task(
+        consumer_class.as_asgi()(_scope(request, user), incoming.get, send), context=contextvars.Context(),
+    )
+    await asyncio.wait([opened, consumer], return_when=asyncio.FIRST_COMPLETED)
+    if not opened.done():
+        consumer.result()  # Raises whatever stopped the consumer before it answered.
+    if opened.result() is not None:
+        consumer.cancel()
+        if opened.result() == 4400:
+            return JsonResponse({'error': 'Invalid subscription'}, status=400)
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    async def events():
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            while True:
+                try:
+                    text = await asyncio.wait_for(frames.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                if text is None:
+                    # Closed by the consumer (e.g. evicted); the browser reconnects.
+                    return
+                yield _event(text)
+        finally:
+            await incoming.put({'type': 'websocket.disconnect', 'code': 1001})
+            try:
+                await asyncio.wait_for(consumer, 5)
+            except Exception:
+                consumer.cancel()
+
+    stream = StreamingHttpResponse(events(), content_type='text/event-stream')
+    stream['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream.
+    stream['X-Accel-Buffering'] = 'no'
+    return stream
@@ -0,0 +1,223 @@
+"""
+Live report events pushed to WebSocket clients through the channel layer.
+
+Events are sent only once the surrounding transaction commits, so a client is
+never told about a row it cannot read yet, and a rolled-back write sends
+nothing. Each sent message is first logged as a ReportEvent whose id becomes
+its ``seq``, so a client that reconnects with the last seq it saw can be sent
+just what it missed (see resume()).
+
+Dashboard messages are also sent to one routing group per municipality,
+status and enclosing geocell of the report, so a connection subscribed to a
+subset of reports joins only the matching groups (see
+consumers.DashboardConsumer) and the publisher's cost does not depend on how
+many subscriptions exist.
+"""
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils.text import slugify
+
+from . import report_feed, report_pages
+from .models import Report, ReportEvent
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_GROUP = 'dashboard_updates'
+
+# Events kept for replay, across all groups; older ones are pruned in steps of
+# EVENT_LOG_PRUNE_EVERY so most inserts skip the delete.
+EVENT_LOG_SIZE = getattr(settings, 'REPORT_EVENT_LOG_SIZE', 5000)
+EVENT_LOG_PRUNE_EVERY = 100
+# A client missing more of its group's events than this gets a snapshot instead.
+REPLAY_LIMIT = getattr(settings, 'REPORT_EVENT_REPLAY_LIMIT', 500)
+# Seqs are allocated by whichever process made the change, so a message can
+# reach a client after ones with higher seqs. Replays start this many seqs
+# before the client's last_seq, and consumers remember at least this many
+# sent seqs, so late messages are neither lost nor sent twice.
+REORDER_WINDOW = getattr(settings, 'REPORT_EVENT_REORDER_WINDOW', 200)
+
+
+# Geocell groups exist for every prefix up to this precision (about 5 km).
+CELL_GROUP_PRECISION = 5
+
+
+def municipality_group(name):
+    return f'{DASHBOARD_GROUP}.municipality.{slugify(name)}'
+
+
+def status_group(status):
+    return f'{DASHBOARD_GROUP}.status.{slugify(status)}'
+
+
+def cell_group(cell):
+    return f'{DASHBOARD_GROUP}.cell.{cell}'
+
+
+def routing_state(report, state=None):
+    """The fields dashboard subscriptions filter on, from ``state`` or the report itself."""
+    state = state or report.tracked_state()
+    return {key: state[key] for key in ('status', 'municipality', 'latitude', 'longitude', 'geocell')}
+
+
+def routing_groups(*states):
+    """Routing groups of every report state in ``states`` (None entries are skipped)."""
+    groups = set()
+    for state in filter(None, states):
+        if state['municipality']:
+            groups.add(municipality_group(state['municipality']))
+        if state['status']:
+            groups.add(status_group(state['status']))
+        if state['geocell']:
+            groups.update(cell_group(state['geocell'][:n]) for n in range(1, CELL_GROUP_PRECISION + 1))
+    return sorted(groups)
+
+
+def user_group(user_id):
+    """Group of one resident's sockets: their own reports and notifications."""
+    return f'user_{user_id}'
+
+
+def _log(group, message):
+    """Record ``message`` in the replay log and return it with its ``seq``."""
+    event = ReportEvent.objects.create(group=group, message=message)
+    if event.pk % EVENT_LOG_PRUNE_EVERY == 0:
+        ReportEvent.objects.filter(id__lte=event.pk - EVENT_LOG_SIZE).delete()
+    return {**message, 'seq': event.pk}
+
+
+def _send(group, message, also=()):
+    """Log ``message`` under ``group`` and send it, seq included, to ``group`` and ``also``."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        message = _log(group, message)
+        for name in (group, *also):
+            async_to_sync(channel_layer.group_send)(name, message)
+    except Exception:
+        # A broken channel layer must not fail the write; clients resync by polling.
+        logger.exception("Could not publish %s to %s", message['type'], group)
+
+
+def _publish(messages):
+    """Send (group, message, routing groups) triples once the current transaction commits."""
+    def send_all():
+        for group, message, also in messages:
+            _send(group, message, also)
+    transaction.on_commit(send_all)
+
+
+def _own_report(report):
+    """What a reporter's own pages need to update a report in place."""
+    return {
+        'id': report.pk,
+        'title': report.title,
+        'description': report.description,
+        'status': report.status,
+        'latitude': report.latitude,
+        'longitude': report.longitude,
+        'created_at': int(report.created_at.timestamp()),
+    }
+
+
+def report_saved(report, created):
+    row = report_feed.map_feed_row(report_feed.report_feed_values(report))
+    # Epoch seconds, as in the columnar feed the dashboard reads.
+    row['created_at'] = int(report.created_at.timestamp())
+    row['municipality'] = report.municipality
+    # ``match`` and ``previous`` are what subscriptions filter on now and
+    # before this save; the update goes to the routing groups of both, so a
+    # report leaving a subscriber's filter can be removed from its view.
+    current = routing_state(report)
+    previous = routing_state(report, report.saved_state) if report.saved_state and not created else None
+    messages = [(DASHBOARD_GROUP, {
+        'type': 'report_updated',
+        'event': 'created' if created else 'updated',
+        'report': row,
+        'match': current,
+        'previous': previous,
+    }, routing_groups(current, previous))]
+
+    # A reassigned report leaves the old reporter's pages and arrives as new on
+    # the new reporter's.
+    previous_reporter = report.saved_state['reporter_id'] if report.saved_state else None
+    reassigned = previous_reporter != report.reporter_id
+    if report.reporter_id:
+        messages.append((user_group(report.reporter_id), {
+            'type': 'report_updated',
+            'event': 'created' if created or reassigned else 'updated',
+            'report': _own_report(report),
+            'previous_status': None if reassigned else report.saved_state['status'],
+        }, ()))
+    if previous_reporter and reassigned:
+        messages.append((user_group(previous_reporter), {'type': 'report_deleted', 'id': report.pk}, ()))
+    _publish(messages)
+
+
+def report_deleted(report):
+    # Routed by the state the dashboards last saw.
+    state = routing_state(report, report.saved_state)
+    messages = [(DASHBOARD_GROUP, {'type': 'report_deleted', 'id': report.pk, 'match': state}, routing_groups(state))]
+    if report.reporter_id:
+        messages.append((user_group(report.reporter_id), {'type': 'report_deleted', 'id': report.pk}, ()))
+    _publish(messages)
+
+
+def notification_created(notification):
+    message = {
+        'type': 'notification_created',
+        'notification': {
+            'id': notification.pk,
+            'message': notification.message,
+            'created_at': int(notification.created_at.timestamp()),
+        },
+    }
+    _publish([(user_group(notification.user_id), message, ())])
+
+
+# ------------------------------
+# Resuming after a reconnect
+# ------------------------------
+def dashboard_snapshot():
+    """Every report in the columnar map feed form, with its delta cursor."""
+    entry = report_feed.cached_snapshot(report_feed.current_feed_version(report_feed.ALL_REPORTS_SCOPE), 'columnar')
+    return {'cursor': entry['cursor'], 'reports': json.loads(entry['body'])}
+
+
+def user_snapshot(user):
+    """The first page of the user's own reports, as /api/reports/ returns it."""
+    return report_pages.page(Report.objects.filter(reporter=user), limit=report_pages.MAX_PAGE_SIZE)
+
+
+def resume(group, last_seq, snapshot):
+    """
+    Messages that bring a client of ``group`` which last saw ``last_seq`` up to
+    date: its missed messages in order, or a ``snapshot`` message built by
+    calling ``snapshot()`` when the log no longer reaches back that far (or
+    they are too many). With no ``last_seq``, a ``hello`` carrying the current
+    seq to count from. Call after joining the group, so nothing newer than the
+    result can be missed. The replay also repeats the REORDER_WINDOW seqs
+    before ``last_seq``, for messages that arrived late; clients skip the
+    ones they already have.
+    """
+    bounds = ReportEvent.objects.aggregate(oldest=Min('id'), latest=Max('id'))
+    latest = bounds['latest'] or 0
+    if last_seq is None:
+        return [{'type': 'hello', 'seq': latest}]
+
+    if last_seq <= latest and (bounds['oldest'] is None or last_seq >= bounds['oldest'] - 1):
+        missed = list(
+            ReportEvent.objects.filter(group=group, id__gt=last_seq - REORDER_WINDOW)
+            .order_by('id').values_list('id', 'message')[:REPLAY_LIMIT + REORDER_WINDOW + 1]
+        )
+        # At most REORDER_WINDOW of them are repeats, so a cut-off list has too many new ones.
+        if sum(seq > last_seq for seq, _ in missed) <= REPLAY_LIMIT:
+            return [{**message, 'seq': seq} for seq, message in missed] + [{'type': 'hello', 'seq': latest}]
+
+    return [{'type': 'snapshot', 'seq': latest, **snapshot()}]
@@ -0,0 +1,137 @@
+"""
+Geohash helpers behind the indexed ``Report.geocell`` column.
+
+A geohash interleaves longitude and latitude bits, so every cell's descendants
+share its prefix and sort next to each other. That turns "reports inside this
+box" into a handful of string range scans on an ordinary B-tree index, which
+works the same on SQLite and PostgreSQL.
+"""
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOCELL_PRECISION = 12
+MAX_COVER_CELLS = 16
+
+
+def encode(latitude, longitude, precision=GEOCELL_PRECISION):
+    """Geohash of a point, or None if either coordinate is missing or invalid."""
+    try:
+        lat = float(latitude)
+        lng = float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        return None
+    lng_bits, lat_bits = _bit_split(precision)
+    ix = min(int((lng + 180.0) / 360.0 * (1 << lng_bits)), (1 << lng_bits) - 1)
+    iy = min(int((lat + 90.0) / 180.0 * (1 << lat_bits)), (1 << lat_bits) - 1)
+    return _interleave(ix, iy, precision)
+
+
+def cell_bounds(cell):
+    """(min_lng, min_lat, max_lng, max_lat) of a geohash cell."""
+    lng_bits, lat_bits = _bit_split(len(cell))
+    ix = iy = 0
+    bit = 0
+    for char in cell:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            if bit % 2 == 0:
+                ix = (ix << 1) | ((value >> shift) & 1)
+            else:
+                iy = (iy << 1) | ((value >> shift) & 1)
+            bit += 1
+    lng_size = 360.0 / (1 << lng_bits)
+    lat_size = 180.0 / (1 << lat_bits)
+    return (
+        -180.0 + ix * lng_size,
+        -90.0 + iy * lat_size,
+        -180.0 + (ix + 1) * lng_size,
+        -90.0 + (iy + 1) * lat_size,
+    )
+
+
+def parse_bbox(value):
+    """Parse ``minLng,minLat,maxLng,maxLat``; raises ValueError if malformed."""
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4 or not all(math.isfinite(part) for part in parts):
+        raise ValueError("bbox must be minLng,minLat,maxLng,maxLat")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError("bbox minimums must not exceed maximums")
+    return (
+        max(min_lng, -180.0), max(min_lat, -90.0),
+        min(max_lng, 180.0), min(max_lat, 90.0),
+    )
+
+
+def cover(bbox, max_cells=MAX_COVER_CELLS, max_precision=GEOCELL_PRECISION):
+    """The finest set of at most ``max_cells`` same-precision cells covering ``bbox``."""
+    best = _cells_at(bbox, 1)
+    for precision in range(2, max_precision + 1):
+        cells = _cells_at(bbox, precision, limit=max_cells)
+        if cells is None:
+            break
+        best = cells
+    return best
+
+
+def cell_ranges(cells):
+    """
+    Merge cells into sorted ``(start, stop)`` string ranges over full-length
+    geohashes; ``stop`` is exclusive and None means unbounded.
+    """
+    ranges = []
+    for cell in sorted(cells):
+        stop = _next_prefix(cell)
+        if ranges and ranges[-1][1] is not None and ranges[-1][1].ljust(len(cell), '0') == cell:
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((cell, stop))
+    return ranges
+
+
+def _bit_split(precision):
+    bits = precision * 5
+    return (bits + 1) // 2, bits // 2
+
+
+def _interleave(ix, iy, precision):
+    lng_bits, lat_bits = _bit_split(precision)
+    chars = []
+    value = 0
+    lng_left, lat_left = lng_bits, lat_bits
+    for bit in range(precision * 5):
+        if bit % 2 == 0:
+            lng_left -= 1
+            value = (value << 1) | ((ix >> lng_left) & 1)
+        else:
+            lat_left -= 1
+            value = (value << 1) | ((iy >> lat_left) & 1)
+        if bit % 5 == 4:
+            chars.append(BASE32[value])
+            value = 0
+    return ''.join(chars)
+
+
+def _cells_at(bbox, precision, limit=None):
+    min_lng, min_lat, max_lng, max_lat = bbox
+    lng_bits, lat_bits = _bit_split(precision)
+    lng_cells, lat_cells = 1 << lng_bits, 1 << lat_bits
+    x0 = min(int((min_lng + 180.0) / 360.0 * lng_cells), lng_cells - 1)
+    x1 = min(int((max_lng + 180.0) / 360.0 * lng_cells), lng_cells - 1)
+    y0 = min(int((min_lat + 90.0) / 180.0 * lat_cells), lat_cells - 1)
+    y1 = min(int((max_lat + 90.0) / 180.0 * lat_cells), lat_cells - 1)
+    if limit is not None and (x1 - x0 + 1) * (y1 - y0 + 1) > limit:
+        return None
+    return [_interleave(x, y, precision) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def _next_prefix(cell):
+    """Smallest string greater than every geohash starting with ``cell``."""
+    while cell:
+        index = BASE32.index(cell[-1])
+        if index < len(BASE32) - 1:
+            return cell[:-1] + BASE32[index + 1]
+        cell = cell[:-1]
+    return None
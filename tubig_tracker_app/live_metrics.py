@@ -0,0 +1,51 @@
+"""
+In-process counters and gauges for the live report streams, served to admins at
+/api/live-metrics/. Each server process keeps its own; sum them across
+workers when there is more than one.
+"""
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+_counters = Counter()
+_gauges = Counter()
+_lock = threading.Lock()
+_started = time.time()
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def adjust(name, amount):
+    """Move a gauge (a current level, such as queued messages) up or down."""
+    with _lock:
+        _gauges[name] += amount
+
+
+def record_max(name, value):
+    """Keep the highest ``value`` seen for ``name``."""
+    with _lock:
+        if value > _gauges[name]:
+            _gauges[name] = value
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    messages = counters.get('stream.messages', 0)
+    frames = counters.get('stream.frames', 0)
+    return {
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - _started),
+        'coalesce_window': getattr(settings, 'REPORT_STREAM_COALESCE_WINDOW', 0.25),
+        'counters': counters,
+        'gauges': gauges,
+        # Frames that one-message-per-frame delivery would have sent on top.
+        'frames_saved': messages - frames,
+    }
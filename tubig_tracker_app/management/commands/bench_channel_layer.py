@@ -0,0 +1,74 @@
+import asyncio
+import time
+import uuid
+
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Measure group fan-out throughput of the configured channel layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=200, help='Channels in the group (one per socket)')
+        parser.add_argument('--messages', type=int, default=50, help='group_send calls')
+        parser.add_argument('--payload-bytes', type=int, default=300, help='Size of each message body')
+        parser.add_argument('--idle-timeout', type=float, default=5.0,
+                            help='Stop waiting once no subscriber has received anything for this long')
+
+    def handle(self, *args, **options):
+        layer = get_channel_layer()
+        if layer is None:
+            raise CommandError('CHANNEL_LAYERS is not configured')
+        self.stdout.write(f'Layer: {type(layer).__module__}.{type(layer).__name__}')
+        result = asyncio.run(self.run(layer, options))
+
+        expected = options['subscribers'] * options['messages']
+        self.stdout.write(
+            f"{options['subscribers']} subscribers x {options['messages']} messages "
+            f"({options['payload_bytes']} bytes each)"
+        )
+        self.stdout.write(f"  send:      {result['send']:.3f}s ({options['messages'] / result['send']:.0f} group_send/s)")
+        rate = result['delivered'] / result['total'] if result['total'] > 0 else 0
+        self.stdout.write(f"  delivered: {result['delivered']}/{expected} in {result['total']:.3f}s ({rate:.0f} messages/s)")
+        if result['delivered'] < expected:
+            self.stdout.write(self.style.WARNING('  Some messages were dropped (channel capacity or expiry)'))
+
+    async def run(self, layer, options):
+        group = f'bench.{uuid.uuid4().hex}'
+        payload = 'x' * options['payload_bytes']
+        channels = [await layer.new_channel() for _ in range(options['subscribers'])]
+        for channel in channels:
+            await layer.group_add(group, channel)
+
+        delivered = 0
+        last_delivery = time.perf_counter()
+
+        async def consume(channel):
+            nonlocal delivered, last_delivery
+            for _ in range(options['messages']):
+                await layer.receive(channel)
+                delivered += 1
+                last_delivery = time.perf_counter()
+
+        consumers = [asyncio.create_task(consume(channel)) for channel in channels]
+        # Let every subscriber start listening before the first send.
+        await asyncio.sleep(0.1)
+
+        start = time.perf_counter()
+        for seq in range(options['messages']):
+            await layer.group_send(group, {'type': 'bench.message', 'seq': seq, 'body': payload})
+        sent = time.perf_counter()
+
+        pending = set(consumers)
+        while pending:
+            _, pending = await asyncio.wait(pending, timeout=0.1)
+            if time.perf_counter() - last_delivery > options['idle_timeout']:
+                break
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        for channel in channels:
+            await layer.group_discard(group, channel)
+        return {'send': sent - start, 'total': max(last_delivery - start, 0.0), 'delivered': delivered}
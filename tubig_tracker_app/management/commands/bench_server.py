@@ -0,0 +1,145 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+from tubig_tracker_app.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure request latency against a running server, first on its own and '
+        'then while it holds idle event streams open (compare WSGI and ASGI setups)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Server base URL')
+        parser.add_argument('--path', default='/api/reports/?limit=25', help='Request to time')
+        parser.add_argument('--username', help='Sign requests in as this user (needed for the streams and login-only paths)')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--streams', type=int, default=200, help='Idle /api/events/user/ streams to hold open')
+        parser.add_argument('--timeout', type=float, default=10.0, help='Per-request and per-stream timeout')
+
+    def handle(self, *args, **options):
+        parts = urlsplit(options['url'])
+        if parts.scheme != 'http':
+            raise CommandError('Only http:// URLs are supported')
+        options['host'] = parts.hostname
+        options['port'] = parts.port or 80
+        options['cookie'] = self.session_cookie(options['username']) if options['username'] else None
+
+        asyncio.run(self.run(options))
+
+    def session_cookie(self, username):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'No user named {username!r}')
+        # The server reads sessions from the same database, so a session made
+        # here signs the benchmark's requests in.
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def report(self, label, result, options):
+        latencies = sorted(result['latencies'])
+        if not latencies:
+            self.stdout.write(self.style.WARNING(f"{label}: no request succeeded ({result['errors']} errors)"))
+            return
+        quantile = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+        self.stdout.write(
+            f"{label}: {len(latencies)}/{options['requests']} ok, {result['errors']} errors, "
+            f"{len(latencies) / result['elapsed']:.0f} req/s; "
+            f"p50 {quantile(0.5):.1f} ms, p95 {quantile(0.95):.1f} ms, p99 {quantile(0.99):.1f} ms, "
+            f"mean {statistics.mean(latencies) * 1000:.1f} ms"
+        )
+
+    def request_bytes(self, path, options, accept=None):
+        lines = [f'GET {path} HTTP/1.1', f"Host: {options['host']}:{options['port']}", 'Connection: close']
+        if options['cookie']:
+            lines.append(f"Cookie: {options['cookie']}")
+        if accept:
+            lines.append(f'Accept: {accept}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+    async def fetch(self, options):
+        """Latency of one request, or None if it failed or timed out."""
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(options['host'], options['port']), options['timeout'])
+            try:
+                writer.write(self.request_bytes(options['path'], options))
+                status = await asyncio.wait_for(reader.readline(), options['timeout'])
+                await asyncio.wait_for(reader.read(), options['timeout'])
+            finally:
+                writer.close()
+        except (OSError, asyncio.TimeoutError):
+            return None
+        if not status.startswith(b'HTTP/1.1 2') and not status.startswith(b'HTTP/1.0 2'):
+            return None
+        return time.perf_counter() - start
+
+    async def load(self, options):
+        latencies = []
+        errors = 0
+        remaining = options['requests']
+
+        async def client():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                latency = await self.fetch(options)
+                if latency is None:
+                    errors += 1
+                else:
+                    latencies.append(latency)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        return {'latencies': latencies, 'errors': errors, 'elapsed': time.perf_counter() - start}
+
+    async def open_stream(self, options):
+        """An open connection that has received its first event, or None."""
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(options['host'], options['port']), options['timeout'])
+        except (OSError, asyncio.TimeoutError):
+            return None
+        writer.write(self.request_bytes('/api/events/user/', options, accept='text/event-stream'))
+        try:
+            # Headers, then the first event (the hello).
+            async with asyncio.timeout(options['timeout']):
+                status = await reader.readline()
+                while (await reader.readline()) not in (b'\r\n', b''):
+                    pass
+                while b'data:' not in await reader.readline():
+                    pass
+        except (OSError, asyncio.TimeoutError):
+            writer.close()
+            return None
+        if b' 200 ' not in status:
+            writer.close()
+            return None
+        return writer
+
+    async def run(self, options):
+        self.report('Requests', await self.load(options), options)
+        streams = [writer for writer in await asyncio.gather(
+            *(self.open_stream(options) for _ in range(options['streams']))) if writer]
+        self.stdout.write(
+            f"Streams: {len(streams)}/{options['streams']} opened "
+            f"(first event received within {options['timeout']:.0f}s)"
+        )
+        self.report(f'Requests with {len(streams)} streams open', await self.load(options), options)
+        for writer in streams:
+            writer.close()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tubig_tracker_app import clusters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed map clusters from the reports table'
+
+    def handle(self, *args, **options):
+        cell_count = clusters.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {cell_count} cluster cells'))
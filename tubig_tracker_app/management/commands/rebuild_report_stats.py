@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tubig_tracker_app import report_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily report statistics from the reports table'
+
+    def handle(self, *args, **options):
+        row_count = report_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {row_count} daily report stats rows'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tubig_tracker_app import status_history
+
+
+class Command(BaseCommand):
+    help = 'Recompute resolution-time percentiles from the report status history (run periodically)'
+
+    def handle(self, *args, **options):
+        rows = status_history.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} resolution time rows'))
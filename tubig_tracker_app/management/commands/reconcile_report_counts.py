@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from tubig_tracker_app import report_counts
+
+
+class Command(BaseCommand):
+    help = 'Correct report status counters that have drifted from the reports table (run periodically)'
+
+    def handle(self, *args, **options):
+        corrections = report_counts.reconcile()
+        for scope, status, stored, actual in corrections:
+            self.stdout.write(self.style.WARNING(f'{scope} {status!r}: {stored} -> {actual}'))
+        self.stdout.write(self.style.SUCCESS(f'Corrected {len(corrections)} report status counters'))
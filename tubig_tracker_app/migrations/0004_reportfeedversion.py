@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tubig_tracker_app', '0003_report_updated_at_reporttombstone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportFeedVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
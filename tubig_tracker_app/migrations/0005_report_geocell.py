@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+from tubig_tracker_app import geo
+
+
+def populate_geocells(apps, schema_editor):
+    Report = apps.get_model('tubig_tracker_app', 'Report')
+    for report in Report.objects.filter(latitude__isnull=False, longitude__isnull=False).iterator():
+        report.geocell = geo.encode(report.latitude, report.longitude)
+        report.save(update_fields=['geocell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tubig_tracker_app', '0004_reportfeedversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='geocell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(populate_geocells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,154 @@
+from django.db import migrations, transaction
+from django.db.utils import DatabaseError
+
+# Full-text index over Report.title, description, location, barangay and the
+# reporter's username, kept current by database triggers so every write path
+# (ORM, bulk_create, raw SQL) is covered. SQLite gets an FTS5 table and
+# PostgreSQL a tsvector column plus pg_trgm indexes for fuzzy place names;
+# other backends have no index and report_search falls back to icontains.
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE report_search USING fts5(
+        title, description, location, barangay, username,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER report_search_insert AFTER INSERT ON {report} BEGIN
+        INSERT INTO report_search (rowid, title, description, location, barangay, username)
+        VALUES (new.id, new.title, new.description, new.location, new.barangay,
+                (SELECT username FROM {user} WHERE id = new.reporter_id));
+    END
+    """,
+    """
+    CREATE TRIGGER report_search_update
+    AFTER UPDATE OF title, description, location, barangay, reporter_id ON {report} BEGIN
+        DELETE FROM report_search WHERE rowid = old.id;
+        INSERT INTO report_search (rowid, title, description, location, barangay, username)
+        VALUES (new.id, new.title, new.description, new.location, new.barangay,
+                (SELECT username FROM {user} WHERE id = new.reporter_id));
+    END
+    """,
+    """
+    CREATE TRIGGER report_search_delete AFTER DELETE ON {report} BEGIN
+        DELETE FROM report_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER report_search_username AFTER UPDATE OF username ON {user} BEGIN
+        UPDATE report_search SET username = new.username
+        WHERE rowid IN (SELECT id FROM {report} WHERE reporter_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO report_search (rowid, title, description, location, barangay, username)
+    SELECT r.id, r.title, r.description, r.location, r.barangay, u.username
+    FROM {report} r LEFT JOIN {user} u ON u.id = r.reporter_id
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS report_search_username',
+    'DROP TRIGGER IF EXISTS report_search_delete',
+    'DROP TRIGGER IF EXISTS report_search_update',
+    'DROP TRIGGER IF EXISTS report_search_insert',
+    'DROP TABLE IF EXISTS report_search',
+]
+
+POSTGRESQL_FORWARD = [
+    'ALTER TABLE {report} ADD COLUMN search_vector tsvector',
+    """
+    CREATE FUNCTION report_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(NEW.location, '') || ' ' || coalesce(NEW.barangay, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(
+                (SELECT username FROM {user} WHERE id = NEW.reporter_id), '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER report_search_vector
+    BEFORE INSERT OR UPDATE OF title, description, location, barangay, reporter_id ON {report}
+    FOR EACH ROW EXECUTE FUNCTION report_search_vector()
+    """,
+    """
+    CREATE FUNCTION report_search_username() RETURNS trigger AS $$
+    BEGIN
+        UPDATE {report} SET reporter_id = reporter_id WHERE reporter_id = NEW.id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER report_search_username
+    AFTER UPDATE OF username ON {user}
+    FOR EACH ROW WHEN (OLD.username IS DISTINCT FROM NEW.username)
+    EXECUTE FUNCTION report_search_username()
+    """,
+    'UPDATE {report} SET reporter_id = reporter_id',
+    'CREATE INDEX report_search_vector_idx ON {report} USING gin (search_vector)',
+]
+
+# Needs the pg_trgm extension, which not every hosting role may create.
+POSTGRESQL_TRIGRAM = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX report_barangay_trgm_idx ON {report} USING gin (barangay gin_trgm_ops)',
+    'CREATE INDEX report_location_trgm_idx ON {report} USING gin (location gin_trgm_ops)',
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP INDEX IF EXISTS report_location_trgm_idx',
+    'DROP INDEX IF EXISTS report_barangay_trgm_idx',
+    'DROP TRIGGER IF EXISTS report_search_username ON {user}',
+    'DROP FUNCTION IF EXISTS report_search_username()',
+    'DROP TRIGGER IF EXISTS report_search_vector ON {report}',
+    'DROP FUNCTION IF EXISTS report_search_vector()',
+    'ALTER TABLE {report} DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _run(apps, schema_editor, statements):
+    tables = {
+        'report': schema_editor.quote_name(apps.get_model('tubig_tracker_app', 'Report')._meta.db_table),
+        'user': schema_editor.quote_name(apps.get_model('tubig_tracker_app', 'User')._meta.db_table),
+    }
+    for statement in statements:
+        schema_editor.execute(statement.format(**tables))
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(apps, schema_editor, SQLITE_FORWARD)
+    elif vendor == 'postgresql':
+        _run(apps, schema_editor, POSTGRESQL_FORWARD)
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                _run(apps, schema_editor, POSTGRESQL_TRIGRAM)
+        except DatabaseError:
+            # Search still works; place names just lose trigram matching.
+            pass
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(apps, schema_editor, SQLITE_REVERSE)
+    elif vendor == 'postgresql':
+        _run(apps, schema_editor, POSTGRESQL_REVERSE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tubig_tracker_app', '0007_report_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+MUNICIPALITIES = ('Naval', 'Caibiran', 'Cabucgayan', 'Biliran', 'Almeria', 'Culaba', 'Kawayan', 'Maripipi')
+
+
+def backfill_municipality(apps, schema_editor):
+    # Complaint submissions store "specific, Brgy. X, Municipality" in location.
+    Report = apps.get_model('tubig_tracker_app', 'Report')
+    batch = []
+    for report in Report.objects.exclude(location=None).only('id', 'location').iterator(chunk_size=2000):
+        name = report.location.rsplit(',', 1)[-1].strip()
+        if name in MUNICIPALITIES:
+            report.municipality = name
+            batch.append(report)
+        if len(batch) >= 500:
+            Report.objects.bulk_update(batch, ['municipality'])
+            batch = []
+    Report.objects.bulk_update(batch, ['municipality'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tubig_tracker_app', '0009_reportevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='municipality',
+            field=models.CharField(blank=True, choices=[('Naval', 'Naval'), ('Caibiran', 'Caibiran'), ('Cabucgayan', 'Cabucgayan'), ('Biliran', 'Biliran'), ('Almeria', 'Almeria'), ('Culaba', 'Culaba'), ('Kawayan', 'Kawayan'), ('Maripipi', 'Maripipi')], max_length=100, null=True),
+        ),
+        migrations.RunPython(backfill_municipality, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:32
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_stats(apps, schema_editor):
+    Report = apps.get_model('tubig_tracker_app', 'Report')
+    DailyReportStats = apps.get_model('tubig_tracker_app', 'DailyReportStats')
+    totals = {}
+    rows = (
+        Report.objects.annotate(day=TruncDate('created_at'))
+        .values_list('day', 'municipality', 'barangay', 'status')
+        .annotate(count=Count('id'))
+    )
+    for day, municipality, barangay, status, count in rows:
+        key = (day, municipality or '', barangay or '', status or '')
+        totals[key] = totals.get(key, 0) + count
+    DailyReportStats.objects.bulk_create(
+        [DailyReportStats(day=day, municipality=municipality, barangay=barangay, status=status, count=count)
+         for (day, municipality, barangay, status), count in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tubig_tracker_app', '0010_report_municipality'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyReportStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('municipality', models.CharField(blank=True, default='', max_length=100)),
+                ('barangay', models.CharField(blank=True, default='', max_length=255)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('day', 'municipality', 'barangay', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
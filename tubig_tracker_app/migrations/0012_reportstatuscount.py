@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:33
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_status_counts(apps, schema_editor):
+    Report = apps.get_model('tubig_tracker_app', 'Report')
+    ReportStatusCount = apps.get_model('tubig_tracker_app', 'ReportStatusCount')
+    totals = {}
+    rows = Report.objects.values_list('status', 'municipality', 'reporter_id').annotate(count=Count('id'))
+    for status, municipality, reporter_id, count in rows:
+        scopes = ['all']
+        if municipality:
+            scopes.append(f'municipality:{municipality}')
+        if reporter_id:
+            scopes.append(f'reporter:{reporter_id}')
+        for scope in scopes:
+            totals[scope, status or ''] = totals.get((scope, status or ''), 0) + count
+    ReportStatusCount.objects.bulk_create(
+        [ReportStatusCount(scope=scope, status=status, count=count) for (scope, status), count in totals.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tubig_tracker_app', '0011_dailyreportstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=120)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_status_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_creation_events(apps, schema_editor):
+    # Reports still Pending have stayed in the status they were created in, so
+    # their history is known; older changes of the others were never recorded.
+    Report = apps.get_model('tubig_tracker_app', 'Report')
+    ReportStatusEvent = apps.get_model('tubig_tracker_app', 'ReportStatusEvent')
+    ReportStatusEvent.objects.bulk_create(
+        (ReportStatusEvent(report_id=pk, from_status=None, to_status='Pending', created_at=created_at)
+         for pk, created_at in Report.objects.filter(status='Pending').values_list('id', 'created_at').iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tubig_tracker_app', '0012_reportstatuscount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResolutionTimeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('value', models.CharField(blank=True, default='', max_length=255)),
+                ('resolved', models.IntegerField(default=0)),
+                ('resolution_p50', models.FloatField(null=True)),
+                ('resolution_p90', models.FloatField(null=True)),
+                ('resolution_p95', models.FloatField(null=True)),
+                ('pending_p50', models.FloatField(null=True)),
+                ('pending_p90', models.FloatField(null=True)),
+                ('in_progress_p50', models.FloatField(null=True)),
+                ('in_progress_p90', models.FloatField(null=True)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('dimension', 'value')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, max_length=20, null=True)),
+                ('to_status', models.CharField(max_length=20)),
+                ('remarks', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='tubig_tracker_app.report')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['report', 'created_at'], name='statusevent_report_idx'), models.Index(fields=['created_at'], name='statusevent_created_idx'), models.Index(fields=['to_status', 'created_at'], name='statusevent_to_status_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_creation_events, migrations.RunPython.noop),
+    ]
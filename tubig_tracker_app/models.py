@@ -1,6 +1,9 @@
 from django.contrib.auth.models import AbstractUser, Group, Permission
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+
+from . import geo
 
 
 # ------------------------------
@@ -250,10 +253,256 @@ class Report(models.Model):
 
     # ADD THIS ↓↓↓
     barangay = models.CharField(max_length=255, null=True, blank=True)
+    municipality = models.CharField(max_length=100, choices=Complaint.AREA_CHOICES, null=True, blank=True)
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every save; the delta feed uses it as its change cursor.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Geohash of (latitude, longitude), kept in sync by save(); indexed for bbox queries.
+    geocell = models.CharField(max_length=12, null=True, blank=True, db_index=True, editable=False)
+
+    # Values as last loaded from or written to the database, so post_save and
+    # post_delete receivers can tell what changed. None for unsaved reports.
+    TRACKED_FIELDS = ('status', 'municipality', 'barangay', 'latitude', 'longitude', 'geocell', 'reporter_id', 'created_at')
+    saved_state = None
+    # Who makes the next status change and why, recorded with it in the
+    # report's status history (ReportStatusEvent) and then cleared.
+    status_changed_by = None
+    status_remarks = ''
+
+    class Meta:
+        # Keyset pagination walks (created_at, id) newest first, optionally
+        # behind one equality filter (see report_pages.FILTER_FIELDS).
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='report_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='report_status_created_idx'),
+            models.Index(fields=['issue_type', '-created_at', '-id'], name='report_issue_created_idx'),
+            models.Index(fields=['barangay', '-created_at', '-id'], name='report_barangay_created_idx'),
+            models.Index(fields=['reporter', '-created_at', '-id'], name='report_reporter_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.saved_state = instance.tracked_state()
+        return instance
+
+    def tracked_state(self):
+        return {name: self.__dict__.get(name) for name in self.TRACKED_FIELDS}
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # What was reloaded is the stored state now.
+        state = self.tracked_state()
+        if fields is not None and self.saved_state is not None:
+            reloaded = {self._meta.get_field(name).attname for name in fields}
+            state = {name: state[name] if name in reloaded else self.saved_state[name] for name in state}
+        self.saved_state = state
+
+    def locked_state(self):
+        """Tracked values of this report's row, locked until the transaction ends (None if gone)."""
+        return Report.objects.select_for_update().filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+
+    def save(self, *args, **kwargs):
+        self.geocell = geo.encode(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            # auto_now only writes listed fields; the delta feed needs updated_at moved.
+            extra = {'updated_at'}
+            if {'latitude', 'longitude'} & set(update_fields):
+                extra.add('geocell')
+            kwargs['update_fields'] = update_fields = {*update_fields, *extra}
+        with transaction.atomic():
+            if not self._state.adding and self.pk is not None:
+                # This instance may be a stale copy: what the save replaces comes
+                # from the locked row, so concurrent saves are seen one after another.
+                self.saved_state = self.locked_state()
+                if self.saved_state and update_fields is not None:
+                    # Tracked fields the save leaves alone keep their stored values.
+                    written = {self._meta.get_field(name).attname for name in update_fields}
+                    for name in set(self.TRACKED_FIELDS) - written:
+                        self.__dict__[name] = self.saved_state[name]
+            super().save(*args, **kwargs)
+        self.saved_state = self.tracked_state()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # As in save(), the post_delete receivers undo the stored state, not
+            # this copy's; a report someone else already deleted is left alone.
+            state = self.locked_state()
+            if state is None:
+                return 0, {}
+            self.saved_state = state
+            return super().delete(*args, **kwargs)
+
+
+# ------------------------------
+# Report Tombstone
+# ------------------------------
+class ReportTombstone(models.Model):
+    """Marker left behind when a Report is deleted, so delta feeds can drop it."""
+    report_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Report #{self.report_id} deleted at {self.deleted_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+# ------------------------------
+# Report Feed Version
+# ------------------------------
+class ReportFeedVersion(models.Model):
+    """
+    Change counter per feed scope ('all' or 'reporter:<id>'), used as the polling
+    ETag, and per geohash cell ('tiles:<cell>') for the vector tile cache.
+    """
+    scope = models.CharField(max_length=64, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.scope} v{self.version}"
+
+
+# ------------------------------
+# Report Cluster Cell
+# ------------------------------
+class ReportClusterCell(models.Model):
+    """Running totals of the reports inside one geohash cell, per cluster precision."""
+    precision = models.PositiveSmallIntegerField()
+    cell = models.CharField(max_length=12)
+    count = models.IntegerField(default=0)
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+    pending = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    resolved = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('precision', 'cell')
+
+    def __str__(self):
+        return f"{self.cell} ({self.count})"
+
+
+# ------------------------------
+# Report Event
+# ------------------------------
+class ReportEvent(models.Model):
+    """
+    One message pushed to a live-update group. The id is its sequence number;
+    only the most recent events are kept, as the replay log for reconnecting
+    WebSocket clients.
+    """
+    group = models.CharField(max_length=100)
+    message = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['group', 'id'], name='reportevent_group_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.message.get('type')} to {self.group}"
+
+
+# ------------------------------
+# Daily Report Stats
+# ------------------------------
+class DailyReportStats(models.Model):
+    """
+    Reports created on ``day`` that are now in ``status``, per municipality and
+    barangay ('' where the report has none). Kept up to date by report writes.
+    """
+    day = models.DateField()
+    municipality = models.CharField(max_length=100, blank=True, default='')
+    barangay = models.CharField(max_length=255, blank=True, default='')
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('day', 'municipality', 'barangay', 'status')
+
+    def __str__(self):
+        return f"{self.day} {self.barangay or '-'}, {self.municipality or '-'} {self.status}: {self.count}"
+
+
+# ------------------------------
+# Report Status Count
+# ------------------------------
+class ReportStatusCount(models.Model):
+    """
+    Number of reports in ``status`` within a scope ('all', 'municipality:<name>'
+    or 'reporter:<id>'), kept exact by report writes.
+    """
+    scope = models.CharField(max_length=120)
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'status')
+
+    def __str__(self):
+        return f"{self.scope} {self.status}: {self.count}"
+
+
+# ------------------------------
+# Report Status Event
+# ------------------------------
+class ReportStatusEvent(models.Model):
+    """
+    One entry of a report's status history: its creation (``from_status`` is
+    None), a status change, or remarks left without changing the status.
+    Written by the Report post_save receiver and never modified.
+    """
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=20, null=True, blank=True)
+    to_status = models.CharField(max_length=20)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    remarks = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['report', 'created_at'], name='statusevent_report_idx'),
+            models.Index(fields=['created_at'], name='statusevent_created_idx'),
+            models.Index(fields=['to_status', 'created_at'], name='statusevent_to_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Report #{self.report_id}: {self.from_status or '-'} -> {self.to_status}"
+
+
+# ------------------------------
+# Resolution Time Stats
+# ------------------------------
+class ResolutionTimeStats(models.Model):
+    """
+    Percentiles, in seconds, of how long resolved reports took to resolve and
+    spent Pending and In Progress on the way, for every report ('all') or per
+    municipality or issue_type ('' where reports have none). Only reports whose
+    history starts with their creation count. Rebuilt from the status history
+    by rebuild_resolution_stats.
+    """
+    dimension = models.CharField(max_length=20)
+    value = models.CharField(max_length=255, blank=True, default='')
+    resolved = models.IntegerField(default=0)
+    resolution_p50 = models.FloatField(null=True)
+    resolution_p90 = models.FloatField(null=True)
+    resolution_p95 = models.FloatField(null=True)
+    pending_p50 = models.FloatField(null=True)
+    pending_p90 = models.FloatField(null=True)
+    in_progress_p50 = models.FloatField(null=True)
+    in_progress_p90 = models.FloatField(null=True)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('dimension', 'value')
+
+    def __str__(self):
+        return f"{self.dimension} {self.value or '-'}: {self.resolved} resolved"
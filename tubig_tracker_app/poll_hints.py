@@ -0,0 +1,92 @@
+"""
+Server-directed polling intervals for the JSON APIs that pages poll while
+their live socket is down. Responses carry ``X-Poll-Interval`` (seconds),
+which the pages use for their next poll.
+"""
+import os
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+MIN_INTERVAL = getattr(settings, 'REPORT_POLL_MIN_INTERVAL', 5)
+BASE_INTERVAL = getattr(settings, 'REPORT_POLL_INTERVAL', 10)
+MAX_INTERVAL = getattr(settings, 'REPORT_POLL_MAX_INTERVAL', 300)
+
+# Data changed this recently is polled at MIN_INTERVAL; data untouched for
+# IDLE_AFTER at twice BASE_INTERVAL.
+RECENT_CHANGE = timedelta(minutes=2)
+IDLE_AFTER = timedelta(hours=1)
+
+# Admin-set slow-down applied on top of everything else (Admin Settings).
+MAX_MULTIPLIER = 10
+MULTIPLIER_CACHE_KEY = 'poll_hints:multiplier'
+# Seconds each process reuses the multiplier it last read from the cache.
+MULTIPLIER_REFRESH = 5
+
+_multiplier = (float('-inf'), 1)
+
+
+def load_factor():
+    """One-minute load average per CPU, never below 1 (1 where the OS has none)."""
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return 1.0
+    return max(load / (os.cpu_count() or 1), 1.0)
+
+
+def multiplier():
+    global _multiplier
+    read_at, value = _multiplier
+    now = time.monotonic()
+    if now - read_at > MULTIPLIER_REFRESH:
+        value = cache.get(MULTIPLIER_CACHE_KEY, 1)
+        _multiplier = (now, value)
+    return value
+
+
+def set_multiplier(value):
+    """Slow every client's polling down ``value`` times (1 restores the default)."""
+    global _multiplier
+    if not 1 <= value <= MAX_MULTIPLIER:
+        raise ValueError(f'Multiplier must be between 1 and {MAX_MULTIPLIER}')
+    if value == 1:
+        cache.delete(MULTIPLIER_CACHE_KEY)
+    else:
+        cache.set(MULTIPLIER_CACHE_KEY, value, None)
+    _multiplier = (time.monotonic(), value)
+
+
+def interval(changed_at):
+    """Seconds before the next poll of data last changed at ``changed_at``."""
+    age = timezone.now() - changed_at if changed_at else None
+    if age is not None and age < RECENT_CHANGE:
+        seconds = MIN_INTERVAL
+    elif age is None or age > IDLE_AFTER:
+        seconds = BASE_INTERVAL * 2
+    else:
+        seconds = BASE_INTERVAL
+    return round(min(seconds * load_factor() * multiplier(), MAX_INTERVAL))
+
+
+def poll_hint(last_modified_func):
+    """
+    Add X-Poll-Interval to a polled view's 200 and 304 responses. Goes above
+    @condition, whose ``last_modified_func`` it reuses (the feed version is
+    read once per request, so this adds no query).
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                changed_at = last_modified_func(request, *args, **kwargs)
+                response['X-Poll-Interval'] = str(interval(changed_at))
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,110 @@
+"""
+Exact report counts by status per scope (ReportStatusCount): everything
+('all'), each municipality and each reporter. Report writes adjust them with
+F() updates, so reading a scope's counts is one indexed lookup however many
+reports there are; reconcile() corrects any drift.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from . import report_feed
+from .models import Report, ReportStatusCount
+
+
+def municipality_scope(name):
+    return f'municipality:{name}'
+
+
+def _keys(state):
+    """(scope, status) counters a saved report is counted in."""
+    if not state:
+        return set()
+    scopes = [report_feed.ALL_REPORTS_SCOPE]
+    if state['municipality']:
+        scopes.append(municipality_scope(state['municipality']))
+    if state['reporter_id']:
+        scopes.append(report_feed.reporter_scope(state['reporter_id']))
+    return {(scope, state['status'] or '') for scope in scopes}
+
+
+def _add(scope, status, amount):
+    rows = ReportStatusCount.objects.filter(scope=scope, status=status)
+    if rows.update(count=F('count') + amount) or amount < 0:
+        return
+    try:
+        with transaction.atomic():
+            ReportStatusCount.objects.create(scope=scope, status=status, count=amount)
+    except IntegrityError:
+        # Another writer created the counter first; add to theirs.
+        rows.update(count=F('count') + amount)
+
+
+def report_saved(report):
+    """Move the report from the counters of its previous state to its current ones."""
+    old = _keys(report.saved_state)
+    new = _keys(report.tracked_state())
+    if old == new:
+        return
+    with transaction.atomic():
+        for scope, status in old - new:
+            _add(scope, status, -1)
+        for scope, status in new - old:
+            _add(scope, status, 1)
+
+
+def report_deleted(report):
+    with transaction.atomic():
+        for scope, status in _keys(report.saved_state or report.tracked_state()):
+            _add(scope, status, -1)
+
+
+def user_deleted(user):
+    # Their reports lose their reporter in a bulk update that sends no signals.
+    ReportStatusCount.objects.filter(scope=report_feed.reporter_scope(user.pk)).delete()
+
+
+def counts(scope):
+    """
+    {status: count} for ``scope``; statuses without reports are missing. A
+    negative count is drift for reconcile() to fix, and is left visible.
+    """
+    return dict(ReportStatusCount.objects.filter(scope=scope).exclude(count=0).values_list('status', 'count'))
+
+
+def expected_counts():
+    """{(scope, status): count} computed from the reports table."""
+    totals = {}
+    rows = Report.objects.values_list('status', 'municipality', 'reporter_id').annotate(count=Count('id'))
+    for status, municipality, reporter_id, count in rows:
+        for key in _keys({'status': status, 'municipality': municipality, 'reporter_id': reporter_id}):
+            totals[key] = totals.get(key, 0) + count
+    return totals
+
+
+def reconcile():
+    """
+    Set every counter to the count from the reports table. Returns the
+    (scope, status, stored, actual) corrections made; none unless some write
+    bypassed the signals (bulk updates, raw SQL) or a bug let them drift.
+    """
+    with transaction.atomic():
+        # Lock the counters before counting: a report write that commits after
+        # the count then waits here and applies its change on top of ours.
+        stored = {
+            (scope, status): count for scope, status, count
+            in ReportStatusCount.objects.select_for_update().values_list('scope', 'status', 'count')
+        }
+        expected = expected_counts()
+        corrections = [
+            (scope, status, stored.get((scope, status), 0), expected.get((scope, status), 0))
+            for scope, status in sorted(set(stored) | set(expected))
+            if stored.get((scope, status), 0) != expected.get((scope, status), 0)
+        ]
+        for scope, status, old, new in corrections:
+            if (scope, status) in stored:
+                ReportStatusCount.objects.filter(scope=scope, status=status).update(count=new)
+            else:
+                _add(scope, status, new)
+        # Counters of scopes that no longer have any reports.
+        ReportStatusCount.objects.filter(count=0).delete()
+    return corrections
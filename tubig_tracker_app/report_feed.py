@@ -0,0 +1,453 @@
+"""
+Serialization and change tracking for the report map feed (/api/all-complaints/).
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta, timezone as dt_timezone
+from itertools import islice
+
+import msgpack
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import F, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import geo
+from .models import Report, ReportFeedVersion, ReportTombstone
+
+
+# Columns read for every map feed row, in the order map_feed_row() expects them.
+MAP_FEED_FIELDS = (
+    'id', 'reporter__username', 'title', 'status', 'latitude', 'longitude',
+    'issue_type', 'barangay', 'created_at',
+)
+
+# Tombstones older than this are pruned; cursors older than this get a full resync.
+TOMBSTONE_RETENTION = timedelta(days=getattr(settings, 'REPORT_TOMBSTONE_RETENTION_DAYS', 7))
+# updated_at and deleted_at are stamped before the write commits, so a change can
+# become visible after newer-stamped ones were already handed out. Every delta
+# re-reads this far behind its cursor; it must outlast the longest transaction
+# that writes reports.
+DELTA_OVERLAP = timedelta(seconds=getattr(settings, 'REPORT_FEED_DELTA_OVERLAP_SECONDS', 60))
+
+
+def _map_coordinates(latitude, longitude):
+    """Return (lat, lng) as floats, or (None, None) if missing or outside the Philippines."""
+    if latitude is None or longitude is None:
+        return None, None
+    try:
+        lat = float(latitude)
+        lng = float(longitude)
+    except (ValueError, TypeError):
+        return None, None
+    if 4.0 <= lat <= 21.0 and 116.0 <= lng <= 127.0:
+        return lat, lng
+    return None, None
+
+
+def _feed_values(values):
+    """Apply the feed's defaults and coordinate check to a MAP_FEED_FIELDS tuple."""
+    report_id, username, title, status, latitude, longitude, issue_type, barangay, created_at = values
+    lat, lng = _map_coordinates(latitude, longitude)
+    return (
+        report_id, username or 'Unknown', title or 'Untitled Report', status or 'Unknown',
+        lat, lng, issue_type or 'General', barangay or 'Unknown', created_at,
+    )
+
+
+def report_feed_values(report):
+    """MAP_FEED_FIELDS tuple for a Report instance."""
+    return (
+        report.pk, report.reporter.username if report.reporter_id else None, report.title, report.status,
+        report.latitude, report.longitude, report.issue_type, report.barangay, report.created_at,
+    )
+
+
+def map_feed_row(values):
+    """Build one map feed item from a MAP_FEED_FIELDS values tuple."""
+    report_id, user, title, status, lat, lng, area, barangay, created_at = _feed_values(values)
+    return {
+        'id': report_id,
+        'user': user,
+        'title': title,
+        'status': status,
+        'latitude': lat,
+        'longitude': lng,
+        'area': area,
+        'barangay': barangay,
+        'created_at': created_at.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+# ------------------------------
+# Wire formats
+# ------------------------------
+# 'json' is the original list of objects. 'columnar' sends one array per field,
+# with the low-cardinality fields dictionary-encoded and created_at as integer
+# epoch seconds; 'msgpack' is the same columnar structure as MessagePack.
+FORMATS = ('json', 'columnar', 'msgpack')
+MSGPACK_CONTENT_TYPE = 'application/x-msgpack'
+DICTIONARY_COLUMNS = ('user', 'status', 'area', 'barangay')
+
+
+def negotiate_format(request):
+    """``format=`` if given, else MessagePack when the Accept header asks for it."""
+    fmt = request.GET.get('format')
+    if fmt in FORMATS:
+        return fmt
+    accept = request.headers.get('Accept', '')
+    if MSGPACK_CONTENT_TYPE in accept or 'application/msgpack' in accept:
+        return 'msgpack'
+    return 'json'
+
+
+def content_type(fmt):
+    return MSGPACK_CONTENT_TYPE if fmt == 'msgpack' else 'application/json'
+
+
+def columns(value_rows):
+    """Columnar form of MAP_FEED_FIELDS tuples."""
+    data = {name: [] for name in ('id', 'title', 'latitude', 'longitude', 'created_at', *DICTIONARY_COLUMNS)}
+    dictionaries = {name: [] for name in DICTIONARY_COLUMNS}
+    codes = {name: {} for name in DICTIONARY_COLUMNS}
+
+    for values in value_rows:
+        report_id, user, title, status, lat, lng, area, barangay, created_at = _feed_values(values)
+        data['id'].append(report_id)
+        data['title'].append(title)
+        data['latitude'].append(lat)
+        data['longitude'].append(lng)
+        data['created_at'].append(int(created_at.timestamp()))
+        for name, value in zip(DICTIONARY_COLUMNS, (user, status, area, barangay)):
+            code = codes[name].get(value)
+            if code is None:
+                code = codes[name][value] = len(dictionaries[name])
+                dictionaries[name].append(value)
+            data[name].append(code)
+
+    data['dictionaries'] = dictionaries
+    return data
+
+
+def encode_reports(value_rows, fmt):
+    """Reports in the structure ``fmt`` uses, ready for encode()."""
+    if fmt == 'json':
+        return [map_feed_row(values) for values in value_rows]
+    return columns(value_rows)
+
+
+def encode(data, fmt):
+    if fmt == 'msgpack':
+        return msgpack.packb(data)
+    return json.dumps(data).encode()
+
+
+def envelope(head, encoded_reports, fmt):
+    """Encode ``head`` plus a ``reports`` key whose value is already encoded."""
+    if fmt == 'msgpack':
+        packer = msgpack.Packer()
+        pairs = b''.join(packer.pack(key) + packer.pack(value) for key, value in head.items())
+        return packer.pack_map_header(len(head) + 1) + pairs + packer.pack('reports') + encoded_reports
+    return json.dumps(head)[:-1].encode() + b', "reports": ' + encoded_reports + b'}'
+
+
+def map_feed_queryset():
+    return Report.objects.order_by('-created_at', '-id')
+
+
+# ------------------------------
+# Viewport (bbox) queries
+# ------------------------------
+VIEWPORT_LIMIT = getattr(settings, 'REPORT_VIEWPORT_LIMIT', 2000)
+
+
+def cell_range_q(field, bbox, max_cells=geo.MAX_COVER_CELLS, max_precision=geo.GEOCELL_PRECISION):
+    """Q turning the geohash cells covering ``bbox`` into index range scans on ``field``."""
+    cells = Q()
+    for start, stop in geo.cell_ranges(geo.cover(bbox, max_cells, max_precision)):
+        cell = Q(**{f'{field}__gte': start})
+        if stop is not None:
+            cell &= Q(**{f'{field}__lt': stop})
+        cells |= cell
+    return cells
+
+
+def bbox_filter(bbox):
+    """
+    Q for reports inside ``bbox``: index range scans over the geohash cells
+    covering the box, then an exact coordinate check for the cell overhang.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return cell_range_q('geocell', bbox) & Q(
+        latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng),
+    )
+
+
+def viewport(bbox, limit=VIEWPORT_LIMIT):
+    """Newest reports inside ``bbox`` in map feed format, plus location and image URL."""
+    rows = list(
+        map_feed_queryset()
+        .filter(bbox_filter(bbox))
+        .values_list(*MAP_FEED_FIELDS, 'location', 'image')[:limit + 1]
+    )
+    reports = []
+    for row in rows[:limit]:
+        item = map_feed_row(row[:len(MAP_FEED_FIELDS)])
+        location, image = row[len(MAP_FEED_FIELDS):]
+        item['location'] = location or 'N/A'
+        item['image'] = default_storage.url(image) if image else None
+        reports.append(item)
+    return {'reports': reports, 'truncated': len(rows) > limit}
+
+
+def parse_cursor(cursor):
+    """Turn a ``since`` query value into an aware datetime (None for a full load)."""
+    if not cursor:
+        return None
+    since = parse_datetime(cursor)
+    if since is None:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since, dt_timezone.utc)
+    return since
+
+
+def needs_reset(since):
+    """True when ``since`` is empty or too old for the tombstones to cover."""
+    return since is None or since < timezone.now() - TOMBSTONE_RETENTION
+
+
+def delta(since, fmt='json'):
+    """
+    Reports created or changed, and ids deleted, after the ``since`` datetime,
+    plus those from DELTA_OVERLAP before it again. Clients apply both by id,
+    so the repeats are harmless.
+    """
+    start = since - DELTA_OVERLAP
+    rows = list(
+        map_feed_queryset().filter(updated_at__gt=start).values_list('updated_at', *MAP_FEED_FIELDS)
+    )
+    tombstones = list(
+        ReportTombstone.objects.filter(deleted_at__gt=start).values_list('deleted_at', 'report_id')
+    )
+
+    # The cursor only moves to the newest change handed out; anything stamped
+    # earlier that commits later is inside the next delta's overlap.
+    stamps = [row[0] for row in rows] + [stamp for stamp, _ in tombstones]
+    next_cursor = max([since, *stamps])
+
+    return {
+        'reset': False,
+        'reports': encode_reports([row[1:] for row in rows], fmt),
+        'deleted': [report_id for _, report_id in tombstones],
+        'cursor': next_cursor.isoformat(),
+    }
+
+
+def record_tombstone(report_id):
+    """Remember a deleted report and prune tombstones past the retention window."""
+    ReportTombstone.objects.create(report_id=report_id)
+    ReportTombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+
+
+# ------------------------------
+# Feed versions (ETag / Last-Modified)
+# ------------------------------
+ALL_REPORTS_SCOPE = 'all'
+
+
+def reporter_scope(user_id):
+    return f'reporter:{user_id}'
+
+
+def bump_feed_versions(report):
+    """Invalidate the global feed and the reporter's own feed after ``report`` changed."""
+    scopes = [ALL_REPORTS_SCOPE]
+    if report.reporter_id:
+        scopes.append(reporter_scope(report.reporter_id))
+    bump_scopes(scopes)
+
+
+def bump_scopes(scopes):
+    """Add one to the version of each of ``scopes``, creating missing ones."""
+    now = timezone.now()
+    for scope in scopes:
+        updated = ReportFeedVersion.objects.filter(scope=scope).update(version=F('version') + 1, updated_at=now)
+        if not updated:
+            ReportFeedVersion.objects.get_or_create(scope=scope, defaults={'version': 1, 'updated_at': now})
+
+
+def reporter_deleting(user):
+    """
+    Stamp ``user``'s reports as changed before deleting the user clears their
+    reporter in a bulk update, which sends no signals, so delta clients see it.
+    """
+    Report.objects.filter(reporter_id=user.pk).update(updated_at=timezone.now())
+
+
+def reporter_deleted(user):
+    """Invalidate the feeds that showed ``user`` as a reporter."""
+    bump_scopes([ALL_REPORTS_SCOPE, reporter_scope(user.pk)])
+    invalidate_snapshot()
+
+
+def current_feed_version(scope):
+    return ReportFeedVersion.objects.filter(scope=scope).values_list('version', flat=True).first() or 0
+
+
+def feed_version(request, scope):
+    """(version, updated_at) for ``scope``, looked up once per request."""
+    cache = request.__dict__.setdefault('_report_feed_versions', {})
+    if scope not in cache:
+        row = ReportFeedVersion.objects.filter(scope=scope).values_list('version', 'updated_at').first()
+        cache[scope] = row or (0, None)
+    return cache[scope]
+
+
+def feed_etag(request, scope):
+    version, _ = feed_version(request, scope)
+    return f'{scope}-{version}'
+
+
+def feed_last_modified(request, scope):
+    return feed_version(request, scope)[1]
+
+
+# Ready-made etag_func / last_modified_func callables for @condition.
+def all_reports_etag(request, *args, **kwargs):
+    # Each wire format and each delta cursor is a separate representation, so
+    # it gets its own tag.
+    fmt = negotiate_format(request)
+    etag = feed_etag(request, ALL_REPORTS_SCOPE)
+    if fmt != 'json':
+        etag = f'{etag}-{fmt}'
+    if 'since' in request.GET:
+        etag = f"{etag}-since-{hashlib.md5(request.GET['since'].encode()).hexdigest()[:12]}"
+    return etag
+
+
+def all_reports_last_modified(request, *args, **kwargs):
+    return feed_last_modified(request, ALL_REPORTS_SCOPE)
+
+
+def user_reports_etag(request, *args, **kwargs):
+    return feed_etag(request, reporter_scope(request.user.pk))
+
+
+def user_reports_last_modified(request, *args, **kwargs):
+    return feed_last_modified(request, reporter_scope(request.user.pk))
+
+
+# ------------------------------
+# Serialized snapshot cache
+# ------------------------------
+# The whole feed is serialized once per change and shared by every reader. The
+# cached entry carries the 'all' feed version it was built from, so a process
+# that missed the post_save/post_delete invalidation still never serves stale data.
+SNAPSHOT_CACHE_KEY = 'report_feed:snapshot:{}'
+SNAPSHOT_LOCK_KEY = 'report_feed:snapshot:{}:lock'
+SNAPSHOT_CACHE_TIMEOUT = getattr(settings, 'REPORT_FEED_CACHE_TIMEOUT', 60 * 60)
+SNAPSHOT_LOCK_TIMEOUT = 30
+SNAPSHOT_WAIT_SECONDS = 2.0
+
+
+def _build_snapshot(version, fmt):
+    # Read the cursor before the rows: anything newer than it is re-sent by the
+    # next delta, which clients apply idempotently.
+    latest = Report.objects.aggregate(latest=Max('updated_at'))['latest']
+    rows = map_feed_queryset().values_list(*MAP_FEED_FIELDS)
+    return {
+        'version': version,
+        'cursor': latest.isoformat() if latest else '',
+        'body': encode(encode_reports(rows, fmt), fmt),
+    }
+
+
+def cached_snapshot(version, fmt='json'):
+    """The serialized feed for ``version``, rebuilt by at most one caller at a time."""
+    key = SNAPSHOT_CACHE_KEY.format(fmt)
+    entry = cache.get(key)
+    if entry is not None and entry['version'] == version:
+        return entry
+
+    lock_key = SNAPSHOT_LOCK_KEY.format(fmt)
+    if not cache.add(lock_key, True, SNAPSHOT_LOCK_TIMEOUT):
+        # Someone else is rebuilding; wait briefly for their result before
+        # falling back to building our own copy.
+        deadline = time.monotonic() + SNAPSHOT_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None and entry['version'] == version:
+                return entry
+        return _build_snapshot(version, fmt)
+
+    try:
+        entry = _build_snapshot(version, fmt)
+        cache.set(key, entry, SNAPSHOT_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return entry
+
+
+def invalidate_snapshot():
+    cache.delete_many([SNAPSHOT_CACHE_KEY.format(fmt) for fmt in FORMATS])
+
+
+def snapshot_body(version, fmt='json'):
+    """Every report, newest first."""
+    return cached_snapshot(version, fmt)['body']
+
+
+def reset_body(version, fmt='json'):
+    """Delta envelope that replaces the client's copy with the full feed."""
+    entry = cached_snapshot(version, fmt)
+    return envelope({'reset': True, 'deleted': [], 'cursor': entry['cursor']}, entry['body'], fmt)
+
+
+# ------------------------------
+# Streaming serialization
+# ------------------------------
+# For tables too large to hold as one body: rows are read with a chunked
+# cursor and encoded as they arrive, so memory stays flat and the opening
+# bracket goes out before the query has run. These are async generators
+# because under ASGI Django collects a sync iterator into a list before
+# sending any of it; a WSGI server does the same with these instead.
+STREAM_CHUNK_SIZE = getattr(settings, 'REPORT_FEED_STREAM_CHUNK_SIZE', 2000)
+
+
+async def _chunks(queryset, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Lists of up to ``chunk_size`` rows from a chunked cursor, each fetched in a
+    thread. This is what QuerySet.aiterator() does, except that for values_list()
+    querysets Django runs the query itself on the event loop and fails.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    next_chunk = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while chunk := await next_chunk():
+        yield chunk
+
+
+async def stream_snapshot():
+    """Yield the JSON list of every report, newest first, in encoded chunks."""
+    yield b'['
+    separator = ''
+    async for chunk in _chunks(map_feed_queryset().values_list(*MAP_FEED_FIELDS)):
+        yield (separator + ', '.join(json.dumps(map_feed_row(values)) for values in chunk)).encode()
+        separator = ', '
+    yield b']'
+
+
+async def stream_reset():
+    """Streaming counterpart of reset_body()."""
+    yield b'{"reset": true, "deleted": [], '
+    # As in _build_snapshot(), the cursor is read before the rows.
+    latest = (await Report.objects.aaggregate(latest=Max('updated_at')))['latest']
+    yield f'"cursor": {json.dumps(latest.isoformat() if latest else "")}, "reports": '.encode()
+    async for chunk in stream_snapshot():
+        yield chunk
+    yield b'}'
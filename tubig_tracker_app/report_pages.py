@@ -0,0 +1,170 @@
+"""
+Filtered, keyset-paginated report listings (/api/reports/).
+
+Pages are ordered by (created_at, id) descending and continue from the last
+row of the previous page rather than an OFFSET, so every page costs the same
+index range scan no matter how deep the client has scrolled.
+"""
+import base64
+import hashlib
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import report_feed
+from .models import Report
+
+PAGE_SIZE = getattr(settings, 'REPORT_PAGE_SIZE', 25)
+MAX_PAGE_SIZE = getattr(settings, 'REPORT_MAX_PAGE_SIZE', 100)
+
+# Exact-match filters and the column each one reads; every column here leads a
+# (column, -created_at, -id) index on Report.
+FILTER_FIELDS = {
+    'status': 'status',
+    'issue_type': 'issue_type',
+    'barangay': 'barangay',
+}
+
+REPORT_FIELDS = (
+    'id', 'title', 'description', 'status', 'issue_type', 'barangay', 'location', 'address',
+    'latitude', 'longitude', 'image', 'reporter_id', 'reporter__username', 'created_at',
+)
+
+
+def can_view_all(user):
+    return user.is_superuser or getattr(user, 'role', None) == 'admin'
+
+
+def visible_reports(user):
+    """Every report for admins, otherwise only the user's own."""
+    reports = Report.objects.all()
+    if not can_view_all(user):
+        reports = reports.filter(reporter=user)
+    return reports
+
+
+# ------------------------------
+# Filters
+# ------------------------------
+def _day_start(value):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"Invalid date: {value!r}")
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def filter_reports(reports, params):
+    """
+    Apply the query-string filters: comma-separated ``status``, ``issue_type``
+    and ``barangay``; ``reporter`` as a user id or username; and inclusive
+    ``date_from`` / ``date_to`` days. Raises ValueError on malformed input.
+    """
+    for param, field in FILTER_FIELDS.items():
+        values = [value.strip() for value in params.get(param, '').split(',') if value.strip()]
+        if len(values) == 1:
+            reports = reports.filter(**{field: values[0]})
+        elif values:
+            reports = reports.filter(**{f'{field}__in': values})
+
+    reporter = params.get('reporter', '').strip()
+    if reporter.isdigit():
+        reports = reports.filter(reporter_id=int(reporter))
+    elif reporter:
+        reports = reports.filter(reporter__username=reporter)
+
+    if params.get('date_from'):
+        reports = reports.filter(created_at__gte=_day_start(params['date_from']))
+    if params.get('date_to'):
+        reports = reports.filter(created_at__lt=_day_start(params['date_to']) + timedelta(days=1))
+    return reports
+
+
+# ------------------------------
+# Keyset cursors
+# ------------------------------
+def encode_cursor(created_at, report_id):
+    raw = f'{created_at.isoformat()}|{report_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from a ``next_cursor`` value; raises ValueError if it is not one."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        stamp, report_id = raw.rsplit('|', 1)
+        created_at = parse_datetime(stamp)
+        report_id = int(report_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if created_at is None:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return created_at, report_id
+
+
+def parse_limit(value):
+    if not value:
+        return PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+# ------------------------------
+# Pages
+# ------------------------------
+def report_row(values):
+    """JSON item for one REPORT_FIELDS values dict."""
+    return {
+        'id': values['id'],
+        'title': values['title'],
+        'description': values['description'],
+        'status': values['status'],
+        'issue_type': values['issue_type'],
+        'barangay': values['barangay'],
+        'location': values['location'],
+        'address': values['address'],
+        'latitude': values['latitude'],
+        'longitude': values['longitude'],
+        'image': default_storage.url(values['image']) if values['image'] else None,
+        'reporter': {'id': values['reporter_id'], 'username': values['reporter__username']},
+        'created_at': values['created_at'].isoformat(),
+        'date_submitted': timezone.localtime(values['created_at']).strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def page(reports, cursor=None, limit=PAGE_SIZE):
+    """One page of ``reports`` after ``cursor``, plus the cursor of the next page (or None)."""
+    reports = reports.order_by('-created_at', '-id')
+    if cursor:
+        created_at, report_id = decode_cursor(cursor)
+        reports = reports.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=report_id))
+
+    rows = list(reports.values(*REPORT_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    return {'reports': [report_row(row) for row in rows], 'next_cursor': next_cursor}
+
+
+# ------------------------------
+# ETag / Last-Modified
+# ------------------------------
+def _scope(request):
+    if can_view_all(request.user):
+        return report_feed.ALL_REPORTS_SCOPE
+    return report_feed.reporter_scope(request.user.pk)
+
+
+def reports_page_etag(request, *args, **kwargs):
+    # Every filter/cursor combination is its own representation of the feed
+    # version; ``t`` is the clients' cache-buster and does not change the page.
+    query = sorted((key, value) for key, value in request.GET.items() if key != 't')
+    digest = hashlib.md5(repr(query).encode()).hexdigest()[:12]
+    return f'{report_feed.feed_etag(request, _scope(request))}-{digest}'
+
+
+def reports_page_last_modified(request, *args, **kwargs):
+    return report_feed.feed_last_modified(request, _scope(request))
@@ -0,0 +1,217 @@
+"""
+Server-side report search over title, description, location, barangay and the
+reporter's username.
+
+The index is built by migration 0008: an FTS5 table on SQLite, a tsvector
+column plus pg_trgm indexes on PostgreSQL; other databases fall back to
+icontains. Results are newest first by id, which follows created_at, so the
+SQLite index can be walked in rowid order instead of sorting every match.
+"""
+import difflib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from . import report_pages
+from .models import Area, Complaint, Municipality, Report
+
+MAX_TERMS = 8
+# Terms shorter than this are never typo-corrected; too many short words are
+# one edit away from a place name.
+MIN_CORRECTION_LENGTH = 4
+CORRECTION_CUTOFF = 0.8
+# FTS5 rowids read per round trip; doubles each round up to the maximum, which
+# stays under SQLite's bound-parameter limit for the follow-up id__in filter.
+SQLITE_BATCH_SIZE = 200
+SQLITE_MAX_BATCH_SIZE = 900
+# Matches walked that way before giving up on it for the current page.
+SQLITE_WALK_LIMIT = 5000
+VOCABULARY_CACHE_KEY = 'report_search:vocabulary'
+VOCABULARY_CACHE_TIMEOUT = getattr(settings, 'REPORT_SEARCH_VOCABULARY_TIMEOUT', 60 * 60)
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+_sqlite_index = None
+_pg_trigram = None
+
+
+def terms(query):
+    return [term.lower() for term in _TERM.findall(query or '')][:MAX_TERMS]
+
+
+def backend():
+    """'sqlite' (FTS5), 'postgresql' (tsvector) or 'fallback' (icontains)."""
+    global _sqlite_index
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        if _sqlite_index is None:
+            _sqlite_index = 'report_search' in connection.introspection.table_names()
+        if _sqlite_index:
+            return 'sqlite'
+    return 'fallback'
+
+
+def _has_trigram():
+    global _pg_trigram
+    if _pg_trigram is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _pg_trigram = cursor.fetchone() is not None
+    return _pg_trigram
+
+
+# ------------------------------
+# Place-name typo correction
+# ------------------------------
+def place_vocabulary():
+    """Lower-cased words from barangay, municipality and area names."""
+    words = cache.get(VOCABULARY_CACHE_KEY)
+    if words is None:
+        names = {name for name, _ in Complaint.AREA_CHOICES}
+        names.update(Report.objects.exclude(barangay=None).values_list('barangay', flat=True).distinct())
+        names.update(Report.objects.exclude(municipality=None).exclude(municipality='').values_list('municipality', flat=True).distinct())
+        names.update(Municipality.objects.values_list('name', flat=True))
+        names.update(Area.objects.values_list('name', flat=True))
+        words = sorted({word for name in names for word in terms(name)})
+        cache.set(VOCABULARY_CACHE_KEY, words, VOCABULARY_CACHE_TIMEOUT)
+    return words
+
+
+def corrections(query_terms):
+    """{term: place word} for terms that look like misspelt place names."""
+    vocabulary = place_vocabulary()
+    known = set(vocabulary)
+    found = {}
+    for term in query_terms:
+        if len(term) < MIN_CORRECTION_LENGTH or term in known:
+            continue
+        match = difflib.get_close_matches(term, vocabulary, n=1, cutoff=CORRECTION_CUTOFF)
+        if match:
+            found[term] = match[0]
+    return found
+
+
+# ------------------------------
+# Backend queries
+# ------------------------------
+def _fts5_query(query_terms, fixed):
+    # Every term must match, as a prefix, either as typed or as corrected.
+    groups = []
+    for term in query_terms:
+        options = [f'"{term}"*']
+        if term in fixed:
+            options.append(f'"{fixed[term]}"')
+        groups.append('(' + ' OR '.join(options) + ')')
+    return ' AND '.join(groups)
+
+
+def _tsquery(query_terms):
+    return ' & '.join(f'{term}:*' for term in query_terms)
+
+
+def _search_q(query_terms, kind, fixed):
+    """Q keeping the reports that match, for the PostgreSQL and fallback backends."""
+    if kind == 'postgresql':
+        table = connection.ops.quote_name(Report._meta.db_table)
+        sql = f"SELECT id FROM {table} WHERE search_vector @@ to_tsquery('simple', %s)"
+        params = [_tsquery(query_terms)]
+        if _has_trigram():
+            # Place names are matched by trigram similarity, which tolerates
+            # typos without a vocabulary.
+            text = ' '.join(query_terms)
+            sql += ' OR barangay %% %s OR location %% %s'
+            params += [text, text]
+        return Q(id__in=RawSQL(sql, params))
+
+    match = Q()
+    for term in query_terms:
+        term_q = Q()
+        for option in {term, fixed.get(term, term)}:
+            term_q |= (
+                Q(title__icontains=option) | Q(description__icontains=option)
+                | Q(location__icontains=option) | Q(barangay__icontains=option)
+                | Q(reporter__username__icontains=option)
+            )
+        match &= term_q
+    return match
+
+
+def _sqlite_ids(reports, expression, before, wanted):
+    """
+    Up to ``wanted`` ids of ``reports`` matching the FTS5 ``expression``, newest
+    first. FTS5 walks its rowids in descending order and stops at the LIMIT,
+    so a batch costs the same however common the terms are; the remaining
+    filters are then applied to each batch by primary key.
+    """
+    found = []
+    batch = SQLITE_BATCH_SIZE
+    scanned = 0
+    while len(found) < wanted:
+        if scanned >= SQLITE_WALK_LIMIT:
+            # The filters reject most matches; let SQLite join the remaining
+            # matches against them in one statement instead.
+            rest = reports.filter(id__in=RawSQL(
+                'SELECT rowid FROM report_search WHERE report_search MATCH %s', [expression],
+            ))
+            if before is not None:
+                rest = rest.filter(id__lt=before)
+            found += rest.order_by('-id').values_list('id', flat=True)[:wanted - len(found)]
+            break
+        sql = 'SELECT rowid FROM report_search WHERE report_search MATCH %s'
+        params = [expression]
+        if before is not None:
+            sql += ' AND rowid < %s'
+            params.append(before)
+        sql += ' ORDER BY rowid DESC LIMIT %s'
+        params.append(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            break
+        keep = set(reports.filter(id__in=ids).values_list('id', flat=True))
+        found += [report_id for report_id in ids if report_id in keep]
+        if len(ids) < batch:
+            break
+        scanned += len(ids)
+        before = ids[-1]
+        batch = min(batch * 2, SQLITE_MAX_BATCH_SIZE)
+    return found[:wanted]
+
+
+def page(reports, query, cursor=None, limit=report_pages.PAGE_SIZE):
+    """
+    One page of ``reports`` matching ``query``, newest first, plus the next
+    page's cursor and ``corrected``: the query with place-name typos fixed, or
+    None. Raises ValueError for a malformed cursor.
+    """
+    try:
+        before = int(cursor) if cursor else None
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    query_terms = terms(query)
+    if not query_terms:
+        return {'reports': [], 'next_cursor': None, 'corrected': None}
+
+    kind = backend()
+    fixed = corrections(query_terms) if kind != 'postgresql' else {}
+
+    if kind == 'sqlite':
+        ids = _sqlite_ids(reports, _fts5_query(query_terms, fixed), before, limit + 1)
+    else:
+        matches = reports.filter(_search_q(query_terms, kind, fixed))
+        if before is not None:
+            matches = matches.filter(id__lt=before)
+        ids = list(matches.order_by('-id').values_list('id', flat=True)[:limit + 1])
+
+    next_cursor = str(ids[limit - 1]) if len(ids) > limit else None
+    rows = {row['id']: row for row in Report.objects.filter(id__in=ids[:limit]).values(*report_pages.REPORT_FIELDS)}
+    return {
+        'reports': [report_pages.report_row(rows[report_id]) for report_id in ids[:limit] if report_id in rows],
+        'next_cursor': next_cursor,
+        'corrected': ' '.join(fixed.get(term, term) for term in query_terms) if fixed else None,
+    }
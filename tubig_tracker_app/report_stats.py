@@ -0,0 +1,165 @@
+"""
+Daily report statistics: one DailyReportStats row per creation day,
+municipality, barangay and status, adjusted in place whenever a report is
+created, deleted or changes one of those, and the time series read from them.
+"""
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyReportStats, Report
+
+BUCKETS = ('day', 'week', 'month')
+GROUP_FIELDS = ('status', 'municipality', 'barangay')
+DEFAULT_RANGE = timedelta(days=29)
+MAX_POINTS = 1000
+
+
+def _key(state):
+    """(day, municipality, barangay, status) a saved report counts towards, or None."""
+    if not state or state['created_at'] is None:
+        return None
+    return (
+        timezone.localdate(state['created_at']),
+        state['municipality'] or '', state['barangay'] or '', state['status'] or '',
+    )
+
+
+def _apply(key, sign):
+    day, municipality, barangay, status = key
+    rows = DailyReportStats.objects.filter(day=day, municipality=municipality, barangay=barangay, status=status)
+    if sign < 0:
+        rows.update(count=F('count') - 1)
+        rows.filter(count__lte=0).delete()
+        return
+    if rows.update(count=F('count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            DailyReportStats.objects.create(
+                day=day, municipality=municipality, barangay=barangay, status=status, count=1,
+            )
+    except IntegrityError:
+        # Another writer created the row first; add to theirs.
+        rows.update(count=F('count') + 1)
+
+
+def report_saved(report):
+    """Move the report's count from its previous key to its current one."""
+    old = _key(report.saved_state)
+    new = _key(report.tracked_state())
+    if old == new:
+        return
+    with transaction.atomic():
+        if old:
+            _apply(old, -1)
+        if new:
+            _apply(new, +1)
+
+
+def report_deleted(report):
+    old = _key(report.saved_state or report.tracked_state())
+    if old:
+        with transaction.atomic():
+            _apply(old, -1)
+
+
+def rebuild():
+    """Recompute every row from the reports table."""
+    totals = {}
+    rows = (
+        Report.objects.annotate(day=TruncDate('created_at'))
+        .values_list('day', 'municipality', 'barangay', 'status')
+        .annotate(count=Count('id'))
+    )
+    for day, municipality, barangay, status, count in rows:
+        key = (day, municipality or '', barangay or '', status or '')
+        totals[key] = totals.get(key, 0) + count
+
+    with transaction.atomic():
+        DailyReportStats.objects.all().delete()
+        DailyReportStats.objects.bulk_create(
+            [DailyReportStats(day=day, municipality=municipality, barangay=barangay, status=status, count=count)
+             for (day, municipality, barangay, status), count in totals.items()],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+# ------------------------------
+# Time series
+# ------------------------------
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def parse_params(params):
+    """(start, end, bucket, group_by) from the query, or ValueError."""
+    try:
+        end = date.fromisoformat(params['to']) if params.get('to') else timezone.localdate()
+        start = date.fromisoformat(params['from']) if params.get('from') else end - DEFAULT_RANGE
+    except ValueError:
+        raise ValueError('from and to must be YYYY-MM-DD dates')
+    if start > end:
+        raise ValueError('from must not be after to')
+    bucket = params.get('bucket') or 'day'
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    group_by = params.get('group_by') or None
+    if group_by is not None and group_by not in GROUP_FIELDS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_FIELDS)}")
+    return start, end, bucket, group_by
+
+
+def series(start, end, bucket='day', group_by=None, filters=None):
+    """
+    Report counts for each ``bucket`` from ``start`` to ``end`` (inclusive
+    dates), as one list per ``group_by`` value or a single 'total'. ``filters``
+    maps GROUP_FIELDS names to lists of allowed values. Buckets are keyed by
+    their first day (weeks start on Monday) and missing ones count 0.
+    """
+    buckets = []
+    current = bucket_start(start, bucket)
+    while current <= end:
+        buckets.append(current)
+        if len(buckets) > MAX_POINTS:
+            raise ValueError(f'Range has more than {MAX_POINTS} {bucket} buckets')
+        current = _next_bucket(current, bucket)
+    index = {day: i for i, day in enumerate(buckets)}
+
+    rows = DailyReportStats.objects.filter(day__range=(start, end))
+    for field, values in (filters or {}).items():
+        if values:
+            rows = rows.filter(**{f'{field}__in': values})
+    fields = ('day', group_by) if group_by else ('day',)
+
+    result = {}
+    for row in rows.values(*fields).annotate(total=Sum('count')):
+        name = (row[group_by] or 'Unknown') if group_by else 'total'
+        counts = result.setdefault(name, [0] * len(buckets))
+        counts[index[bucket_start(row['day'], bucket)]] += row['total']
+    if not group_by:
+        result.setdefault('total', [0] * len(buckets))
+
+    return {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'bucket': bucket,
+        'buckets': [day.isoformat() for day in buckets],
+        'series': result,
+    }
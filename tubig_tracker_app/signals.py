@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Notification, Report, User
+from . import clusters, dashboard_stats, events, report_counts, report_feed, report_stats, status_history, vector_tiles
+
+
+@receiver(post_save, sender=Report)
+def report_saved(sender, instance, created, **kwargs):
+    report_feed.bump_feed_versions(instance)
+    report_feed.invalidate_snapshot()
+    clusters.report_saved(instance)
+    vector_tiles.report_saved(instance)
+    report_stats.report_saved(instance)
+    report_counts.report_saved(instance)
+    status_history.report_saved(instance, created)
+    events.report_saved(instance, created)
+    dashboard_stats.invalidate()
+
+
+@receiver(post_delete, sender=Report)
+def report_deleted(sender, instance, **kwargs):
+    report_feed.record_tombstone(instance.pk)
+    report_feed.bump_feed_versions(instance)
+    report_feed.invalidate_snapshot()
+    clusters.report_deleted(instance)
+    vector_tiles.report_deleted(instance)
+    report_stats.report_deleted(instance)
+    report_counts.report_deleted(instance)
+    events.report_deleted(instance)
+    dashboard_stats.invalidate()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    # Only sign-ups change the dashboard's user counts; logins save the user too.
+    if created:
+        dashboard_stats.invalidate()
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    report_feed.reporter_deleting(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    report_feed.reporter_deleted(instance)
+    report_counts.user_deleted(instance)
+    dashboard_stats.invalidate()
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    if created:
+        events.notification_created(instance)
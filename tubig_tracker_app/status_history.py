@@ -0,0 +1,137 @@
+"""
+Report status history (ReportStatusEvent) and the resolution-time
+percentiles computed from it (ResolutionTimeStats).
+"""
+from itertools import groupby
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ReportStatusEvent, ResolutionTimeStats
+
+RESOLVED = 'Resolved'
+DIMENSIONS = ('municipality', 'issue_type')
+PERCENTILES = {'resolution': (50, 90, 95), 'pending': (50, 90), 'in_progress': (50, 90)}
+
+
+def report_saved(report, created):
+    """Record the report's creation, a status change, or remarks left with a save."""
+    old = None if created else (report.saved_state or {}).get('status')
+    if not created and old == report.status and not report.status_remarks:
+        return
+    ReportStatusEvent.objects.create(
+        report=report,
+        from_status=old,
+        to_status=report.status,
+        changed_by=report.status_changed_by,
+        remarks=report.status_remarks or '',
+        created_at=report.created_at if created else timezone.now(),
+    )
+    report.status_changed_by = None
+    report.status_remarks = ''
+
+
+def history(report_id):
+    """The report's status history, oldest first, as JSON items."""
+    events = (
+        ReportStatusEvent.objects.filter(report_id=report_id)
+        .order_by('created_at', 'id')
+        .values_list('from_status', 'to_status', 'remarks', 'changed_by__username', 'created_at')
+    )
+    return [
+        {'from': old, 'to': new, 'remarks': remarks, 'changed_by': username, 'at': at.isoformat()}
+        for old, new, remarks, username, at in events
+    ]
+
+
+# ------------------------------
+# Resolution times
+# ------------------------------
+def percentile(values, q):
+    """``q``-th percentile (0-100) of sorted ``values``, interpolating between ranks."""
+    if not values:
+        return None
+    rank = (len(values) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _durations(events):
+    """
+    Seconds a report took to be resolved the first time, and spent Pending
+    and In Progress until then. ``events`` are its events, oldest first.
+    None unless the history starts with the report's creation: before that
+    it may already have been resolved, even if its first recorded change
+    looks like a first resolution.
+    """
+    if events[0]['from_status'] is not None:
+        return None
+    created_at = events[0]['report__created_at']
+    status, since, spent = None, created_at, {}
+    for event in events:
+        if status is not None:
+            spent[status] = spent.get(status, 0) + (event['created_at'] - since).total_seconds()
+        status, since = event['to_status'], event['created_at']
+        if status == RESOLVED:
+            return {
+                'resolution': (event['created_at'] - created_at).total_seconds(),
+                'pending': spent.get('Pending', 0),
+                'in_progress': spent.get('In Progress', 0),
+            }
+    return None
+
+
+def rebuild():
+    """Recompute every ResolutionTimeStats row from the status history."""
+    resolved_reports = ReportStatusEvent.objects.filter(to_status=RESOLVED).values('report_id')
+    events = (
+        ReportStatusEvent.objects.filter(report_id__in=resolved_reports)
+        .order_by('report_id', 'created_at', 'id')
+        .values('report_id', 'report__created_at', 'report__municipality', 'report__issue_type',
+                'from_status', 'to_status', 'created_at')
+    )
+    groups = {}
+    for _, report_events in groupby(events.iterator(chunk_size=2000), key=lambda event: event['report_id']):
+        report_events = list(report_events)
+        durations = _durations(report_events)
+        if durations is None:
+            continue
+        keys = [('all', '')] + [(field, report_events[0][f'report__{field}'] or '') for field in DIMENSIONS]
+        for key in keys:
+            samples = groups.setdefault(key, {metric: [] for metric in PERCENTILES})
+            for metric, seconds in durations.items():
+                samples[metric].append(seconds)
+
+    now = timezone.now()
+    rows = []
+    for (dimension, value), samples in groups.items():
+        fields = {}
+        for metric, qs in PERCENTILES.items():
+            values = sorted(samples[metric])
+            for q in qs:
+                fields[f'{metric}_p{q}'] = percentile(values, q)
+        rows.append(ResolutionTimeStats(
+            dimension=dimension, value=value, resolved=len(samples['resolution']), computed_at=now, **fields,
+        ))
+    with transaction.atomic():
+        ResolutionTimeStats.objects.all().delete()
+        ResolutionTimeStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def resolution_times(dimension=None):
+    """Stored rows as dicts, all of them or one ``dimension``'s, most resolved first."""
+    rows = ResolutionTimeStats.objects.order_by('dimension', '-resolved', 'value')
+    if dimension:
+        rows = rows.filter(dimension=dimension)
+    return [
+        {
+            'dimension': row.dimension,
+            'value': row.value,
+            'resolved': row.resolved,
+            **{f'{metric}_p{q}': getattr(row, f'{metric}_p{q}') for metric, qs in PERCENTILES.items() for q in qs},
+            'computed_at': row.computed_at.isoformat(),
+        }
+        for row in rows
+    ]
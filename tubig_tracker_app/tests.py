@@ -1,3 +1,208 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from . import clusters, report_counts, report_feed, report_stats
+from .models import DailyReportStats, Report, ReportClusterCell, ReportStatusEvent, User
+
+
+def _report(**fields):
+    values = {'title': 'Leak', 'description': 'Main line leak', 'latitude': 11.56, 'longitude': 124.40,
+              'municipality': 'Naval'}
+    values.update(fields)
+    return Report.objects.create(**values)
+
+
+class IncrementalStateMixin:
+    """Compares the incrementally kept tables with a rebuild from the reports table."""
+
+    def setUp(self):
+        cache.clear()
+
+    def cluster_cells(self):
+        return sorted(
+            (cell.precision, cell.cell, cell.count, round(cell.latitude_sum, 6), round(cell.longitude_sum, 6),
+             cell.pending, cell.in_progress, cell.resolved)
+            for cell in ReportClusterCell.objects.filter(count__gt=0)
+        )
+
+    def daily_stats(self):
+        return sorted(DailyReportStats.objects.filter(count__gt=0).values_list(
+            'day', 'municipality', 'barangay', 'status', 'count',
+        ))
+
+    def assertNoDrift(self):
+        self.assertEqual(report_counts.reconcile(), [])
+        cells, stats = self.cluster_cells(), self.daily_stats()
+        clusters.rebuild()
+        report_stats.rebuild()
+        self.assertEqual(self.cluster_cells(), cells)
+        self.assertEqual(self.daily_stats(), stats)
+
+
+class ReportSaveTests(IncrementalStateMixin, TestCase):
+    def test_stale_copies_are_counted_once(self):
+        report = _report()
+        first = Report.objects.get(pk=report.pk)
+        second = Report.objects.get(pk=report.pk)
+        first.status = 'In Progress'
+        first.save()
+        second.status = 'Resolved'
+        second.save()
+
+        self.assertEqual(report_counts.counts('all'), {'Resolved': 1})
+        self.assertEqual(
+            list(ReportStatusEvent.objects.order_by('id').values_list('from_status', 'to_status')),
+            [(None, 'Pending'), ('Pending', 'In Progress'), ('In Progress', 'Resolved')],
+        )
+        self.assertNoDrift()
+
+    def test_update_fields_keeps_unlisted_fields_and_moves_updated_at(self):
+        report = _report()
+        stale = Report.objects.get(pk=report.pk)
+        moved = Report.objects.get(pk=report.pk)
+        moved.municipality = 'Biliran'
+        moved.save(update_fields=['municipality'])
+        before = Report.objects.get(pk=report.pk).updated_at
+
+        time.sleep(0.01)
+        stale.status = 'Resolved'
+        stale.save(update_fields=['status'])
+
+        stored = Report.objects.get(pk=report.pk)
+        self.assertEqual((stored.status, stored.municipality), ('Resolved', 'Biliran'))
+        self.assertEqual(stale.municipality, 'Biliran')
+        self.assertGreater(stored.updated_at, before)
+        self.assertEqual(report_counts.counts('municipality:Biliran'), {'Resolved': 1})
+        self.assertEqual(report_counts.counts('municipality:Naval'), {})
+        self.assertNoDrift()
+
+    def test_refresh_from_db_resets_saved_state(self):
+        report = _report()
+        other = Report.objects.get(pk=report.pk)
+        other.status, other.municipality = 'Resolved', 'Biliran'
+        other.save()
+
+        report.refresh_from_db(fields=['status'])
+        self.assertEqual((report.saved_state['status'], report.saved_state['municipality']), ('Resolved', 'Naval'))
+        report.refresh_from_db()
+        self.assertEqual(report.saved_state, other.tracked_state())
+
+
+class ReportDeleteTests(IncrementalStateMixin, TestCase):
+    def test_deleting_twice_undoes_the_report_once(self):
+        report = _report()
+        _report(latitude=11.57, longitude=124.58, municipality='Caibiran')
+        copy = Report.objects.get(pk=report.pk)
+
+        self.assertEqual(report.delete()[1]['tubig_tracker_app.Report'], 1)
+        self.assertEqual(copy.delete(), (0, {}))
+        self.assertEqual(report_counts.counts('all'), {'Pending': 1})
+        self.assertNoDrift()
+
+    def test_stale_copy_undoes_the_stored_state(self):
+        report = _report()
+        stale = Report.objects.get(pk=report.pk)
+        report.status = 'Resolved'
+        report.save()
+        stale.delete()
+        self.assertEqual(report_counts.counts('all'), {})
+        self.assertNoDrift()
+
+
+class ReconcileTests(IncrementalStateMixin, TestCase):
+    def test_no_drift_after_mixed_writes(self):
+        reporter = User.objects.create_user('resident', password='secret')
+        reports = [_report(reporter=reporter), _report(municipality='Biliran', barangay='Larrazabal'), _report()]
+        reports[0].status = 'In Progress'
+        reports[0].save()
+        reports[1].latitude, reports[1].longitude = 11.46, 124.47
+        reports[1].save(update_fields=['latitude', 'longitude'])
+        reports[2].municipality = 'Almeria'
+        reports[2].save()
+        reports[2].delete()
+        Report.objects.get(pk=reports[1].pk).delete()
+
+        self.assertNoDrift()
+        out = StringIO()
+        call_command('reconcile_report_counts', stdout=out)
+        self.assertIn('Corrected 0 report status counters', out.getvalue())
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        _report()
+        Report.objects.update(status='Resolved')  # sends no signals
+        self.assertEqual(report_counts.reconcile(), [
+            ('all', 'Pending', 1, 0), ('all', 'Resolved', 0, 1),
+            ('municipality:Naval', 'Pending', 1, 0), ('municipality:Naval', 'Resolved', 0, 1),
+        ])
+        self.assertEqual(report_counts.reconcile(), [])
+
+
+class ReportFeedDeltaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+
+    def feed(self, since):
+        response = self.client.get('/api/all-complaints/', {'since': since})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_first_load_is_a_reset(self):
+        report = _report()
+        data = self.feed('')
+        self.assertTrue(data['reset'])
+        self.assertEqual([row['id'] for row in data['reports']], [report.pk])
+        self.assertIsNotNone(report_feed.parse_cursor(data['cursor']))
+
+    def test_cursor_older_than_tombstone_retention_is_a_reset(self):
+        _report()
+        since = timezone.now() - report_feed.TOMBSTONE_RETENTION - timedelta(minutes=1)
+        self.assertTrue(self.feed(since.isoformat())['reset'])
+
+    def test_delta_returns_changes_and_tombstones(self):
+        changed, deleted = _report(), _report()
+        cursor = self.feed('')['cursor']
+        changed.status = 'Resolved'
+        changed.save(update_fields=['status'])
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        data = self.feed(cursor)
+        self.assertFalse(data['reset'])
+        self.assertEqual({row['id']: row['status'] for row in data['reports']}[changed.pk], 'Resolved')
+        self.assertEqual(data['deleted'], [deleted_id])
+        self.assertGreaterEqual(report_feed.parse_cursor(data['cursor']), report_feed.parse_cursor(cursor))
+
+    def test_delta_rereads_the_overlap_window(self):
+        report = _report()
+        # A write stamped before the cursor that only became visible after it.
+        Report.objects.filter(pk=report.pk).update(updated_at=timezone.now() - timedelta(seconds=5))
+        cursor = timezone.now().isoformat()
+        data = self.feed(cursor)
+        self.assertEqual([row['id'] for row in data['reports']], [report.pk])
+        self.assertEqual(data['cursor'], report_feed.parse_cursor(cursor).isoformat())
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/all-complaints/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleting_a_reporter_reaches_delta_and_etag(self):
+        reporter = User.objects.create_user('resident', password='secret')
+        report = _report(reporter=reporter)
+        # Long enough ago that only the deletion can bring it back into a delta.
+        Report.objects.filter(pk=report.pk).update(updated_at=timezone.now() - 2 * report_feed.DELTA_OVERLAP)
+        first = self.client.get('/api/all-complaints/')
+        cursor = timezone.now().isoformat()
+        reporter.delete()
 
-# Create your tests here.
+        response = self.client.get('/api/all-complaints/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['user'], 'Unknown')
+        rows = self.feed(cursor)['reports']
+        self.assertEqual([(row['id'], row['user']) for row in rows], [(report.pk, 'Unknown')])
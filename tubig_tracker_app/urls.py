@@ -80,6 +80,17 @@ urlpatterns = [
     # ------------------------------
     path('api/complaints/', views.get_complaints, name='get_complaints'),
    path('api/all-complaints/', views.get_all_complaints, name='get_all_complaints'),
+    path('api/reports/', views.api_reports, name='api_reports'),
+    path('api/reports/search/', views.api_report_search, name='api_report_search'),
+    path('api/reports/<int:report_id>/', views.api_report_detail, name='api_report_detail'),
+    path('api/events/dashboard/', views.api_dashboard_events, name='api_dashboard_events'),
+    path('api/events/user/', views.api_user_events, name='api_user_events'),
+    path('api/live-metrics/', views.api_live_metrics, name='api_live_metrics'),
+    path('api/report-stats/', views.api_report_stats, name='api_report_stats'),
+    path('api/resolution-stats/', views.api_resolution_stats, name='api_resolution_stats'),
+    path('api/reports/viewport/', views.api_reports_viewport, name='api_reports_viewport'),
+    path('api/reports/clusters/', views.api_report_clusters, name='api_report_clusters'),
+    path('tiles/reports/<int:z>/<int:x>/<int:y>.mvt', views.report_tile, name='report_tile'),
 
     # ------------------------------
     # ADDITIONAL REPORT PAGES
@@ -0,0 +1,248 @@
+"""
+Mapbox Vector Tiles (MVT 2.1) of report points, with a per-tile disk cache
+keyed by change counters of the geohash cells each tile covers.
+
+The encoder only covers what the reports layer needs (point features with
+string attributes), so it writes the protobuf wire format directly instead of
+pulling in a protobuf dependency.
+"""
+import math
+import os
+import tempfile
+import time
+
+from django.conf import settings
+
+from . import geo, report_feed
+from .models import Report, ReportFeedVersion
+
+LAYER_NAME = 'reports'
+EXTENT = 4096
+# Points this far outside the tile (in tile units) are still included, so
+# markers drawn across a tile edge are not clipped.
+BUFFER = 64
+MAX_ZOOM = 20
+MAX_FEATURES = getattr(settings, 'REPORT_TILE_MAX_FEATURES', 20000)
+CACHE_DIR = getattr(settings, 'REPORT_TILE_CACHE_DIR', None)
+# Finest geohash cells (~5 km at precision 5) with their own change counter; a
+# report write only invalidates the cached tiles that cover its cells.
+TILE_CELL_PRECISION = getattr(settings, 'REPORT_TILE_CELL_PRECISION', 5)
+TILE_SCOPE = 'tiles:{}'
+# Seconds a cached tile is served; bounds how stale writes that send no signals
+# (bulk updates, raw SQL), and so bump no cell counter, can leave it.
+CACHE_TIMEOUT = getattr(settings, 'REPORT_TILE_CACHE_TIMEOUT', 60 * 60)
+CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+
+# ------------------------------
+# Tile geometry (Web Mercator)
+# ------------------------------
+def _lng_to_x(lng, zoom):
+    return (lng + 180.0) / 360.0 * (1 << zoom)
+
+
+def _lat_to_y(lat, zoom):
+    lat = max(min(lat, 85.0511287798), -85.0511287798)
+    rad = math.radians(lat)
+    return (1.0 - math.log(math.tan(rad) + 1.0 / math.cos(rad)) / math.pi) / 2.0 * (1 << zoom)
+
+
+def _y_to_lat(y, zoom):
+    n = math.pi - 2.0 * math.pi * y / (1 << zoom)
+    return math.degrees(math.atan(math.sinh(n)))
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+def tile_bbox(z, x, y, buffer=0.0):
+    """(min_lng, min_lat, max_lng, max_lat) of a tile, grown by ``buffer`` tile fractions."""
+    n = 1 << z
+    return (
+        max((x - buffer) / n * 360.0 - 180.0, -180.0),
+        _y_to_lat(y + 1 + buffer, z),
+        min((x + 1 + buffer) / n * 360.0 - 180.0, 180.0),
+        _y_to_lat(y - buffer, z),
+    )
+
+
+# ------------------------------
+# Protobuf encoding
+# ------------------------------
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 31)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field, values):
+    return _length_delimited(field, b''.join(_varint(v) for v in values))
+
+
+def encode_layer(points, z, x, y):
+    """
+    Encode ``points`` — (id, lat, lng, {attribute: str}) tuples — as a single
+    point layer of tile z/x/y and return the Tile message bytes.
+    """
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    features = bytearray()
+
+    for feature_id, lat, lng, attributes in points:
+        px = round((_lng_to_x(lng, z) - x) * EXTENT)
+        py = round((_lat_to_y(lat, z) - y) * EXTENT)
+        tags = []
+        for name, value in attributes.items():
+            if value is None:
+                continue
+            if name not in key_index:
+                key_index[name] = len(keys)
+                keys.append(name)
+            if value not in value_index:
+                value_index[value] = len(values)
+                values.append(value)
+            tags += [key_index[name], value_index[value]]
+
+        feature = (
+            _key(1, 0) + _varint(feature_id)
+            + _packed(2, tags)
+            + _key(3, 0) + _varint(1)  # GeomType.POINT
+            + _packed(4, [(1 << 3) | 1, _zigzag(px), _zigzag(py)])  # MoveTo(1) x, y
+        )
+        features += _length_delimited(2, feature)
+
+    if not features:
+        return b''
+
+    layer = (
+        _key(15, 0) + _varint(2)
+        + _length_delimited(1, LAYER_NAME.encode())
+        + bytes(features)
+        + b''.join(_length_delimited(3, k.encode()) for k in keys)
+        + b''.join(_length_delimited(4, _length_delimited(1, v.encode())) for v in values)
+        + _key(5, 0) + _varint(EXTENT)
+    )
+    return _length_delimited(3, layer)
+
+
+def render_tile(z, x, y):
+    bbox = tile_bbox(z, x, y, buffer=BUFFER / EXTENT)
+    rows = (
+        Report.objects.filter(report_feed.bbox_filter(bbox))
+        .order_by('-created_at')
+        .values_list('id', 'latitude', 'longitude', 'status', 'issue_type')[:MAX_FEATURES]
+    )
+    points = [
+        (report_id, lat, lng, {'status': status, 'issue_type': issue_type})
+        for report_id, lat, lng, status, issue_type in rows
+    ]
+    return encode_layer(points, z, x, y)
+
+
+# ------------------------------
+# Cell versions
+# ------------------------------
+def _scopes(geocell):
+    """Counter scopes of ``geocell``'s prefixes, coarsest first."""
+    return [TILE_SCOPE.format(geocell[:p]) for p in range(1, TILE_CELL_PRECISION + 1)]
+
+
+def report_changed(*states):
+    """Bump the counters of the cells a report was in and is in now (its tracked ``states``)."""
+    scopes = []
+    for state in states:
+        if state and state['geocell']:
+            scopes += [scope for scope in _scopes(state['geocell']) if scope not in scopes]
+    report_feed.bump_scopes(scopes)
+
+
+def report_saved(report):
+    report_changed(report.saved_state, report.tracked_state())
+
+
+def report_deleted(report):
+    report_changed(report.saved_state)
+
+
+def tile_version(z, x, y):
+    """
+    Sum of the counters of the cells covering tile z/x/y (with its buffer).
+    Counters only ever go up, so the sum moves on whenever a report inside the
+    tile changes; writes elsewhere leave it alone unless the tile is wide
+    enough to be covered by cells coarser than TILE_CELL_PRECISION.
+    """
+    bbox = tile_bbox(z, x, y, buffer=BUFFER / EXTENT)
+    cells = geo.cover(bbox, max_precision=TILE_CELL_PRECISION)
+    versions = ReportFeedVersion.objects.filter(scope__in=[TILE_SCOPE.format(cell) for cell in cells])
+    return sum(versions.values_list('version', flat=True))
+
+
+# ------------------------------
+# Disk cache
+# ------------------------------
+def _tile_dir(z, x, y):
+    return os.path.join(CACHE_DIR, str(z), str(x), str(y))
+
+
+def _prune(directory, version):
+    """Remove the tile's files for versions older than ``version``."""
+    for name in os.listdir(directory):
+        stem, ext = os.path.splitext(name)
+        if ext == '.mvt' and stem.isdigit() and int(stem) < version:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def cached_tile(z, x, y):
+    """
+    Tile bytes read from the disk cache or rendered and stored. Tiles are filed
+    under the version read before rendering, so a write to a report inside the
+    tile, from any process, moves readers on to a fresh one, and a tile
+    rendered while a write commits is only ever served for the version before it.
+    """
+    if not CACHE_DIR:
+        return render_tile(z, x, y)
+
+    version = tile_version(z, x, y)
+    directory = _tile_dir(z, x, y)
+    path = os.path.join(directory, f'{version}.mvt')
+    try:
+        if time.time() - os.path.getmtime(path) < CACHE_TIMEOUT:
+            with open(path, 'rb') as tile_file:
+                return tile_file.read()
+    except FileNotFoundError:
+        pass
+
+    data = render_tile(z, x, y)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+        _prune(directory, version)
+    except OSError:
+        # The cache is an optimisation; the tile is still served.
+        pass
+    return data
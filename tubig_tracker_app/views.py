@@ -6,16 +6,17 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models.functions import ExtractMonth
-from django.db.models import Avg, Count, Q
-from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.db.models import Avg
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
 from datetime import date
 import json
 import random
 
 from .models import User, Complaint, ComplaintPhoto, Announcement, Feedback, Report, Notification, WaterBill, Municipality
+from . import clusters, consumers, dashboard_stats, event_stream, geo, live_metrics, poll_hints, report_counts, report_feed, report_pages, report_search, report_stats, status_history, vector_tiles
 
 logger = logging.getLogger(__name__)
 from .forms import UserRegistrationForm, ComplaintForm
@@ -54,31 +55,22 @@ def logout_view(request):
 # DASHBOARDS
 @login_required
 def dashboard_view(request):
-    print(f"DEBUG: Dashboard view accessed")
-    print(f"DEBUG: User authenticated: {request.user.is_authenticated}")
-    print(f"DEBUG: User: {request.user}")
-    print(f"DEBUG: User ID: {request.user.id if request.user.is_authenticated else 'None'}")
-    print(f"DEBUG: Session key: {request.session.session_key}")
-    
     user = request.user
     if getattr(user, 'role', None) == 'admin':
-        print("DEBUG: User is admin, redirecting to admin dashboard")
         return redirect('admin_dashboard')
 
     # Use Report instead of Complaint
     reports = Report.objects.filter(reporter=user).order_by('-created_at')
-    print(f"DEBUG: Found {reports.count()} reports for user")
+    counts = report_counts.counts(report_feed.reporter_scope(user.pk))
 
     context = {
         'user': user,
-        'total_reports': reports.count(),
-        'pending': reports.filter(status='Pending').count(),
-        'in_progress': reports.filter(status='In Progress').count(),
-        'resolved': reports.filter(status='Resolved').count(),
+        'total_reports': sum(counts.values()),
+        'pending': counts.get('Pending', 0),
+        'in_progress': counts.get('In Progress', 0),
+        'resolved': counts.get('Resolved', 0),
         'recent_updates': reports[:5],  # optionally show recent reports
     }
-
-    print("DEBUG: Rendering dashboard template")
     return render(request, 'user/dashboard.html', context)
 
 # ------------------------------
@@ -86,79 +78,34 @@ def dashboard_view(request):
 # ------------------------------
 @login_required
 def admin_dashboard(request):
-    today = timezone.localdate()
-    current_year = today.year
-    
-    # Use Report model for all stats to match the map
-    total_reports = Report.objects.count()
-    resolved_reports = Report.objects.filter(status='Resolved').count()
-    pending_reports = Report.objects.filter(status='Pending').count()
-    in_progress_reports = Report.objects.filter(status='In Progress').count()
-    active_users = User.objects.count()
-    
-    print(f"DEBUG: Admin Dashboard Stats - Total: {total_reports}, Pending: {pending_reports}, In Progress: {in_progress_reports}, Resolved: {resolved_reports}")
-
-    # Reports per month
-    reports_per_month = (
-        Report.objects.filter(created_at__year=current_year)
-        .annotate(month=ExtractMonth('created_at'))
-        .values('month')
-        .annotate(count=Count('id'))
-        .order_by('month')
-    )
-    reports_per_month_data = [0] * 12
-    for entry in reports_per_month:
-        reports_per_month_data[entry['month'] - 1] = entry['count']
-
-    # User growth per month
-    user_growth_per_month = (
-        User.objects.filter(date_joined__year=current_year)
-        .annotate(month=ExtractMonth('date_joined'))
-        .values('month')
-        .annotate(count=Count('id'))
-        .order_by('month')
-    )
-    user_growth_data = [0] * 12
-    for entry in user_growth_per_month:
-        user_growth_data[entry['month'] - 1] = entry['count']
+    stats = dashboard_stats.rollup()
 
     # System notifications
     system_notifications = []
-    latest_user = User.objects.order_by('-date_joined').first()
-    latest_report = Report.objects.order_by('-created_at').first()
-    if latest_user:
-        system_notifications.append(f"New user registered: {latest_user.username}")
-    if latest_report:
-        system_notifications.append(f"New report received: {latest_report.title}")
+    if stats['latest_user']:
+        system_notifications.append(f"New user registered: {stats['latest_user']}")
+    if stats['latest_report']:
+        system_notifications.append(f"New report received: {stats['latest_report']}")
     system_notifications.append("System check completed successfully.")
 
     context = {
-        'total_users': active_users,
-        'total_reports': total_reports,
-        'resolved_reports': resolved_reports,
-        'pending_reports': pending_reports,
-        'in_progress_reports': in_progress_reports,
-        'reports_per_month_data': reports_per_month_data,
-        'user_growth_data': user_growth_data,
+        'total_users': stats['total_users'],
+        'total_reports': stats['total_reports'],
+        'resolved_reports': stats['resolved_reports'],
+        'pending_reports': stats['pending_reports'],
+        'in_progress_reports': stats['in_progress_reports'],
+        'reports_per_month_data': stats['reports_per_month'],
+        'user_growth_data': stats['users_per_month'],
+        'resolution_times': stats['resolution_times'],
         'system_notifications': system_notifications,
     }
-    
-    # Debug context data without printing to avoid encoding issues
-    print(f"DEBUG: Total reports in context: {context['total_reports']}")
-    print(f"DEBUG: Pending reports: {context['pending_reports']}")
-    print(f"DEBUG: In progress reports: {context['in_progress_reports']}")
-    print(f"DEBUG: Resolved reports: {context['resolved_reports']}")
-    
-    # Also check if we have any reports with coordinates
-    reports_with_coords = Report.objects.filter(latitude__isnull=False, longitude__isnull=False).count()
-    print(f"DEBUG: Reports with coordinates: {reports_with_coords}")
     return render(request, 'admin/admin_dashboard.html', context)
 
 # USER REPORTS
 @login_required
 def my_reports(request):
-    reports = Report.objects.filter(reporter=request.user).order_by('-created_at')
-    return render(request, 'user/my_reports.html', {'reports': reports})
+    # Rows are loaded page by page from api_reports.
+    return render(request, 'user/my_reports.html', {'page_size': report_pages.PAGE_SIZE})
 
 
 
@@ -232,6 +179,7 @@ def add_complaint_view(request):
                 location=full_location,
                 address=barangay if barangay != 'Unknown' else municipality,
                 barangay=barangay if barangay != 'Unknown' else '',
+                municipality=municipality if municipality in dict(Complaint.AREA_CHOICES) else None,
                 latitude=lat_float,
                 longitude=lng_float,
                 image=photo_file if photo_file else None,
@@ -248,6 +196,8 @@ def add_complaint_view(request):
         form = ComplaintForm()
     return render(request, 'user/add_complaint.html', {'form': form})
 @login_required
+@poll_hints.poll_hint(report_feed.user_reports_last_modified)
+@condition(etag_func=report_feed.user_reports_etag, last_modified_func=report_feed.user_reports_last_modified)
 def api_user_reports(request):
     # Fetch reports submitted by the logged-in user
     reports = Report.objects.filter(reporter=request.user).order_by('-created_at')
@@ -319,18 +269,27 @@ def delete_user(request, user_id):
 # ADMIN REPORT MANAGEMENT
 @login_required
 def admin_manage_reports(request):
-    reports = Report.objects.all().order_by('-created_at')
-    return render(request, 'admin/admin_manage_reports.html', {'reports': reports})
+    # Cards are loaded page by page from api_reports.
+    return render(request, 'admin/admin_manage_reports.html', {
+        'page_size': report_pages.PAGE_SIZE,
+        'status_choices': [value for value, _ in Report.STATUS_CHOICES],
+    })
 
+@login_required
 @require_http_methods(["POST"])
 def update_report_status(request, report_id):
+    if not report_pages.can_view_all(request.user):
+        return JsonResponse({'success': False, 'error': 'Forbidden'}, status=403)
     try:
         data = json.loads(request.body)
         status = data.get('status')
-        remarks = data.get('remarks', '')
+        if status not in dict(Report.STATUS_CHOICES):
+            return JsonResponse({'success': False, 'error': 'Invalid status'}, status=400)
         report = Report.objects.get(id=report_id)
         report.status = status
-        report.remarks = remarks
+        # Kept with the change in the report's status history.
+        report.status_changed_by = request.user
+        report.status_remarks = data.get('remarks') or ''
         report.save()
         return JsonResponse({'success': True, 'status': status, 'id': report_id})
     except Report.DoesNotExist:
@@ -422,12 +381,19 @@ def admin_settings_view(request):
         messages.error(request, "You are not authorized to access this page.")
         return redirect('dashboard')
     if request.method == 'POST':
+        try:
+            poll_hints.set_multiplier(float(request.POST.get('poll_multiplier') or 1))
+        except ValueError:
+            messages.error(request, f"Polling slow-down must be a number from 1 to {poll_hints.MAX_MULTIPLIER}.")
+            return redirect('admin_settings_view')
         messages.success(request, "Settings updated successfully.")
         return redirect('admin_settings_view')
     context = {
         'site_title': "Tubig Tracker",
         'contact_email': "admin@tubigtracker.com",
         'system_status_message': "Water supply is currently normal.",
+        'poll_multiplier': poll_hints.multiplier(),
+        'max_poll_multiplier': poll_hints.MAX_MULTIPLIER,
     }
     return render(request, 'admin/admin_settings.html', context)
 
@@ -507,57 +473,74 @@ def mark_bill_paid(request, bill_id):
 
 # API ENDPOINTS
 @csrf_exempt
+@poll_hints.poll_hint(report_feed.all_reports_last_modified)
+@condition(etag_func=report_feed.all_reports_etag, last_modified_func=report_feed.all_reports_last_modified)
 def get_all_complaints(request):
-    reports = Report.objects.all().select_related('reporter').order_by('-created_at')
-    data = []
-    valid_reports = 0
-    
-    print(f"DEBUG: Found {reports.count()} total reports in database")
-    
-    for r in reports:
-        # Process coordinates
-        lat = None
-        lng = None
-        
-        if r.latitude is not None and r.longitude is not None:
-            try:
-                lat = float(r.latitude)
-                lng = float(r.longitude)
-                # Validate coordinates are reasonable (Philippines bounds)
-                if 4.0 <= lat <= 21.0 and 116.0 <= lng <= 127.0:
-                    valid_reports += 1
-                    print(f"DEBUG: Report {r.id} has valid coordinates: {lat}, {lng}")
-                else:
-                    print(f"DEBUG: Report {r.id} coordinates out of bounds: {lat}, {lng}")
-                    lat = lng = None
-            except (ValueError, TypeError) as e:
-                print(f"DEBUG: Report {r.id} coordinate conversion error: {e}")
-                lat = lng = None
+    """
+    Map feed for the admin dashboard.
+
+    Without ``since`` this returns every report as a list. With ``since`` (the
+    ``cursor`` from a previous response, or empty for a first load) it returns
+    only reports changed and ids deleted after that point. ``stream=1`` sends
+    full JSON listings incrementally instead of from the cached snapshot.
+    ``format=columnar|msgpack`` (or ``Accept: application/x-msgpack``) selects
+    the compact columnar encoding of the reports.
+    """
+    version, _ = report_feed.feed_version(request, report_feed.ALL_REPORTS_SCOPE)
+    fmt = report_feed.negotiate_format(request)
+    content_type = report_feed.content_type(fmt)
+    stream = request.GET.get('stream') == '1' and fmt == 'json'
+
+    if 'since' not in request.GET:
+        if stream:
+            response = StreamingHttpResponse(report_feed.stream_snapshot(), content_type=content_type)
         else:
-            print(f"DEBUG: Report {r.id} missing coordinates: lat={r.latitude}, lng={r.longitude}")
-        
-        report_data = {
-            'id': r.id,
-            'user': r.reporter.username if r.reporter else 'Unknown',
-            'title': r.title or 'Untitled Report',
-            'status': r.status or 'Unknown',
-            'latitude': lat,
-            'longitude': lng,
-            'area': r.issue_type or 'General',
-            'barangay': r.barangay or 'Unknown',
-            'created_at': r.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        }
-        
-        data.append(report_data)
-    
-    print(f"DEBUG: API returning {len(data)} total reports, {valid_reports} with valid coordinates")
-    
-    # Log first report for debugging
-    if data:
-        print(f"DEBUG: First report data: {data[0]}")
-    
-    return JsonResponse(data, safe=False)
+            response = HttpResponse(report_feed.snapshot_body(version, fmt), content_type=content_type)
+    else:
+        try:
+            since = report_feed.parse_cursor(request.GET['since'])
+        except ValueError:
+            return JsonResponse({'error': 'Invalid since cursor'}, status=400)
+        if not report_feed.needs_reset(since):
+            body = report_feed.encode(report_feed.delta(since, fmt), fmt)
+            response = HttpResponse(body, content_type=content_type)
+        elif stream:
+            response = StreamingHttpResponse(report_feed.stream_reset(), content_type=content_type)
+        else:
+            response = HttpResponse(report_feed.reset_body(version, fmt), content_type=content_type)
+
+    patch_vary_headers(response, ['Accept'])
+    return response
 @login_required
+def api_reports_viewport(request):
+    """Reports inside ``bbox=minLng,minLat,maxLng,maxLat`` for the Leaflet maps."""
+    try:
+        bbox = geo.parse_bbox(request.GET.get('bbox', ''))
+    except ValueError:
+        return JsonResponse({'error': 'bbox must be minLng,minLat,maxLng,maxLat'}, status=400)
+    return JsonResponse(report_feed.viewport(bbox))
+
+@login_required
+def api_report_clusters(request):
+    """Precomputed marker clusters for ``zoom`` and ``bbox=minLng,minLat,maxLng,maxLat``."""
+    try:
+        bbox = geo.parse_bbox(request.GET.get('bbox', ''))
+        zoom = int(request.GET.get('zoom', ''))
+    except ValueError:
+        return JsonResponse({'error': 'zoom and bbox=minLng,minLat,maxLng,maxLat are required'}, status=400)
+    return JsonResponse(clusters.clusters(bbox, zoom))
+
+@login_required
+def report_tile(request, z, x, y):
+    """Report points for one z/x/y map tile as a Mapbox Vector Tile."""
+    if not vector_tiles.is_valid_tile(z, x, y):
+        return JsonResponse({'error': 'Tile out of range'}, status=404)
+    data = vector_tiles.cached_tile(z, x, y)
+    return HttpResponse(data, content_type=vector_tiles.CONTENT_TYPE)
+
+@login_required
+@poll_hints.poll_hint(report_feed.user_reports_last_modified)
+@condition(etag_func=report_feed.user_reports_etag, last_modified_func=report_feed.user_reports_last_modified)
 def get_complaints(request):
     # Only fetch reports where the user is the reporter
     reports = Report.objects.filter(reporter=request.user)  
@@ -578,53 +561,94 @@ def get_complaints(request):
 
 
 
+@login_required
+@poll_hints.poll_hint(report_pages.reports_page_last_modified)
+@condition(etag_func=report_pages.reports_page_etag, last_modified_func=report_pages.reports_page_last_modified)
 def api_reports(request):
-    status = request.GET.get('status', '')
-    user_filter = request.GET.get('user', '')
-    search = request.GET.get('q', '')
-    municipalities = request.GET.get('municipalities', '').split(',') if request.GET.get('municipalities') else []
-    reports = Complaint.objects.all()
-    if status:
-        reports = reports.filter(status=status)
-    if user_filter:
-        reports = reports.filter(user__username__icontains=user_filter)
-    if search:
-        reports = reports.filter(Q(title__icontains=search) | Q(description__icontains=search))
-    if municipalities:
-        reports = reports.filter(area__in=municipalities)
-    report_data = [
-        {
-            'id': r.id,
-            'title': r.title,
-            'description': r.description,
-            'status': r.status,
-            'latitude': r.latitude,
-            'longitude': r.longitude,
-            'date_submitted': r.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'user': {'username': r.user.username, 'email': r.user.email},
-            'photos': [{'url': p.photo.url} for p in r.complaintphoto_set.all()]
-        }
-        for r in reports
-    ]
-    return JsonResponse({'reports': report_data})
+    """
+    One page of reports, newest first. Admins see every report, other users
+    their own. Filters: ``status``, ``issue_type``, ``barangay``, ``reporter``,
+    ``date_from``, ``date_to``; pass ``next_cursor`` back as ``cursor`` for the
+    following page.
+    """
+    try:
+        reports = report_pages.filter_reports(report_pages.visible_reports(request.user), request.GET)
+        limit = report_pages.parse_limit(request.GET.get('limit'))
+        return JsonResponse(report_pages.page(reports, request.GET.get('cursor'), limit))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-def api_report_detail(request, report_id):
+@login_required
+@condition(etag_func=report_pages.reports_page_etag, last_modified_func=report_pages.reports_page_last_modified)
+def api_report_search(request):
+    """
+    Reports matching ``q`` across title, description, location, barangay and
+    reporter, newest first, with the same filters as api_reports. ``corrected``
+    is the query with misspelt place names fixed, when that was needed.
+    """
     try:
-        r = Complaint.objects.get(id=report_id)
-        data = {
-            'id': r.id,
-            'title': r.title,
-            'description': r.description,
-            'status': r.status,
-            'latitude': r.latitude,
-            'longitude': r.longitude,
-            'date_submitted': r.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'user': {'username': r.user.username, 'email': r.user.email},
-            'photos': [{'url': p.photo.url} for p in r.complaintphoto_set.all()],
-        }
-        return JsonResponse(data)
-    except Complaint.DoesNotExist:
+        reports = report_pages.filter_reports(report_pages.visible_reports(request.user), request.GET)
+        limit = report_pages.parse_limit(request.GET.get('limit'))
+        return JsonResponse(report_search.page(reports, request.GET.get('q', ''), request.GET.get('cursor'), limit))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+async def api_dashboard_events(request):
+    """Server-Sent Events version of /ws/dashboard/ (same filters, plus Last-Event-ID resume)."""
+    return await event_stream.response(consumers.DashboardConsumer, request)
+
+@login_required
+async def api_user_events(request):
+    """Server-Sent Events version of /ws/user/."""
+    return await event_stream.response(consumers.UserConsumer, request)
+
+@login_required
+def api_live_metrics(request):
+    """This process's live stream counters, including frames saved by coalescing."""
+    if not report_pages.can_view_all(request.user):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    return JsonResponse(live_metrics.snapshot())
+
+@login_required
+def api_report_stats(request):
+    """
+    Report counts over time from the daily stats table: ``from``/``to``
+    (YYYY-MM-DD, default the last 30 days), ``bucket=day|week|month``,
+    ``group_by=status|municipality|barangay``, and any of those three as
+    filters (repeatable).
+    """
+    if not report_pages.can_view_all(request.user):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    try:
+        start, end, bucket, group_by = report_stats.parse_params(request.GET)
+        filters = {field: request.GET.getlist(field) for field in report_stats.GROUP_FIELDS}
+        return JsonResponse(report_stats.series(start, end, bucket, group_by, filters))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+def api_report_detail(request, report_id):
+    row = report_pages.visible_reports(request.user).filter(id=report_id).values(*report_pages.REPORT_FIELDS).first()
+    if row is None:
         return JsonResponse({'error': 'Report not found'}, status=404)
+    data = report_pages.report_row(row)
+    data['status_history'] = status_history.history(report_id)
+    return JsonResponse(data)
+
+@login_required
+def api_resolution_stats(request):
+    """
+    Precomputed resolution-time percentiles (seconds), overall and per
+    municipality and issue_type; ``by=municipality|issue_type`` limits them
+    to one of those.
+    """
+    if not report_pages.can_view_all(request.user):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+    by = request.GET.get('by') or None
+    if by is not None and by not in status_history.DIMENSIONS:
+        return JsonResponse({'error': f"by must be one of {', '.join(status_history.DIMENSIONS)}"}, status=400)
+    return JsonResponse({'rows': status_history.resolution_times(by)})
 
 # PUBLIC PAGES
 def report_issue(request):